@@ -1,87 +1,472 @@
+import contextlib
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import cv2
 import numpy as np
-from mtcnn.mtcnn import MTCNN
 
-from tensorflow.keras.applications import ResNet50
-from tensorflow.keras.models import Model, load_model
-from tensorflow.keras.applications.resnet50 import preprocess_input
-from tensorflow.keras.preprocessing.sequence import pad_sequences
+from instrumentation import count
+from model_registry import registry
+from pipeline_control import JobControl
+from result_cache import StageChain, file_digest
+
+CLASSIFIER_PATH = 'my_model.keras'
+# Every FRAME_INTERVAL-th frame is sampled, and the LSTM sees at most MAX_SEQUENCE_LENGTH faces
+FRAME_INTERVAL = 15
+MAX_SEQUENCE_LENGTH = 108
+# Size of the ResNet50 pooled feature vector
+FEATURE_DIM = 2048
+# Memory-bounded mode keeps only the first MAX_SEQUENCE_LENGTH faces (the ones the LSTM sees), stores them
+# already resized to the ResNet input size and writes their features into one preallocated, padded buffer,
+# so peak memory does not grow with the video's duration. TRUTHLENS_FEATURE_DTYPE=float16 halves the buffer.
+MEMORY_BOUNDED = os.getenv('TRUTHLENS_MEMORY_BOUNDED', '0') == '1'
+FEATURE_DTYPE = os.getenv('TRUTHLENS_FEATURE_DTYPE', 'float32')
+RESNET_INPUT_SIZE = 224
+# "keras" runs the Keras models, "tflite" the optimized artifacts written by `python tflite_backend.py export`
+INFERENCE_BACKEND = os.getenv('TRUTHLENS_INFERENCE_BACKEND', 'keras')
+# Channel means subtracted by ResNet50's preprocess_input, in BGR order
+IMAGENET_BGR_MEAN = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+
+# Face detection settings, see extract_highest_confidence_face_from_frames
+DETECTION_WORKERS = int(os.getenv('TRUTHLENS_DETECTION_WORKERS', '1'))
+DETECTION_EXECUTOR = os.getenv('TRUTHLENS_DETECTION_EXECUTOR', 'thread')
+DETECTION_MAX_DIMENSION = int(os.getenv('TRUTHLENS_DETECTION_MAX_DIMENSION') or 0) or None
+
+# "interval" samples every FRAME_INTERVAL-th frame of the whole video; "adaptive" spreads at most
+# MAX_SEQUENCE_LENGTH samples over the video's duration, since the LSTM never sees more than that
+SAMPLING_MODE = os.getenv('TRUTHLENS_SAMPLING', 'interval')
+# Adaptive mode only: stop sampling once the running verdict is stable, see sample_faces_with_early_exit
+EARLY_EXIT = os.getenv('TRUTHLENS_EARLY_EXIT', '0') == '1'
+EARLY_EXIT_MIN_CONFIDENCE = 0.7
+EARLY_EXIT_TOLERANCE = 0.05
+
+# Run MTCNN only on every TRUTHLENS_KEYFRAME_INTERVAL-th sampled frame and track the face in between
+# (0 runs MTCNN on every sampled frame), see FaceTracker
+KEYFRAME_INTERVAL = int(os.getenv('TRUTHLENS_KEYFRAME_INTERVAL', '0'))
+
+# Timeline mode scores overlapping MAX_SEQUENCE_LENGTH-face windows this many faces apart, see timeline_prediction
+TIMELINE_STRIDE = int(os.getenv('TRUTHLENS_TIMELINE_STRIDE', str(MAX_SEQUENCE_LENGTH // 2)))
+
+logger = logging.getLogger(__name__)
+
+
+# TensorFlow and MTCNN are imported by the loaders, so importing this module stays cheap
+def _load_classifier():
+    from tensorflow.keras.models import load_model
+    return load_model(CLASSIFIER_PATH)
+
+def _load_feature_extractor():
+    from tensorflow.keras.applications import ResNet50
+    from tensorflow.keras.models import Model
+    model = ResNet50(weights='imagenet', include_top=False, pooling='avg')
+    return Model(inputs=model.input, outputs=model.output)
 
+def _load_mtcnn():
+    from mtcnn.mtcnn import MTCNN
+    return MTCNN()
 
-def extract_frames_from_video(video_path, frame_interval=15):
+def _load_optimized(name):
+    from tflite_backend import load_artifact
+    return load_artifact(name)
+
+# Models are loaded once on first use and shared by every prediction
+if INFERENCE_BACKEND == 'tflite':
+    registry.register('deepfake_classifier', lambda: _load_optimized('deepfake_classifier'))
+    registry.register('resnet50_features', lambda: _load_optimized('resnet50_features'))
+elif INFERENCE_BACKEND == 'keras':
+    registry.register('deepfake_classifier', _load_classifier)
+    registry.register('resnet50_features', _load_feature_extractor)
+else:
+    raise ValueError(f"Unknown inference backend '{INFERENCE_BACKEND}', expected 'keras' or 'tflite'")
+registry.register('mtcnn', _load_mtcnn)
+
+
+def import_backends():
+    """Import the libraries the models need without loading any model, see job_runner.preload_pipelines."""
+    import mtcnn.mtcnn
+    if INFERENCE_BACKEND == 'keras':
+        import tensorflow.keras.applications
+
+
+def plan_sample_positions(total_frames, fps, frame_interval=15, time_interval=None, max_frames=None):
     """
-    Extract frames from a single video and return them as a list for later processing.
+    Decide which frame indices to decode from a video.
 
     Args:
-    - video_path (str): Path to the input video file.
-    - frame_interval (int): Interval for frame extraction (e.g., extract every 30th frame).
+    - total_frames (int): Number of frames reported by the container (0 or less if unknown).
+    - fps (float): Frame rate reported by the container.
+    - frame_interval (int): Keep every `frame_interval`-th frame.
+    - time_interval (float): Keep one frame every `time_interval` seconds (overrides frame_interval).
+    - max_frames (int): Keep at most `max_frames` frames spread evenly over the video (overrides both).
 
     Returns:
-    - frames (list): A list of frames extracted from the video.
+    - positions (iterator): Increasing frame indices. Unbounded when the frame count is unknown.
+    """
+    if max_frames is not None and total_frames > 0:
+        count = min(max_frames, total_frames)
+        return iter(np.unique(np.linspace(0, total_frames - 1, count).round().astype(int)).tolist())
+
+    step = frame_interval
+    if time_interval is not None and fps > 0:
+        step = round(time_interval * fps)
+    step = max(1, int(step))
+
+    if total_frames > 0:
+        return iter(range(0, total_frames, step))
+    return itertools.count(0, step)
+
+
+def video_properties(video_path):
+    """Return (total_frames, fps) as reported by the container, without decoding anything."""
+    video = cv2.VideoCapture(video_path)
+    try:
+        return int(video.get(cv2.CAP_PROP_FRAME_COUNT)), video.get(cv2.CAP_PROP_FPS)
+    finally:
+        video.release()
+
+
+def iter_video_frames(video_path, frame_interval=15, time_interval=None, max_frames=None,
+                      max_dimension=None, seek_threshold=60, positions=None):
+    """
+    Stream sampled frames from a video, decoding only the frames that are kept.
+
+    Frames between two samples are skipped with `grab()` (no colour conversion or copy), and long
+    gaps are skipped by seeking, so memory stays bounded to one frame at a time.
+
+    Args:
+    - video_path (str): Path to the input video file.
+    - frame_interval, time_interval, max_frames: Sampling mode, see `plan_sample_positions`.
+    - max_dimension (int): If set, frames are downscaled so their longest side is at most this size.
+    - seek_threshold (int): Gaps longer than this many frames are skipped by seeking instead of grabbing.
+    - positions (iterable): Explicit frame indices to decode, overriding the sampling mode. They may be
+      in any order; going backwards costs a seek.
+
+    Yields:
+    - (frame_index, frame): Index of the frame in the video and the BGR frame.
     """
-    # Open the video file
     video = cv2.VideoCapture(video_path)
 
     # Get the total frame count and frame rate
     total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = video.get(cv2.CAP_PROP_FPS)
 
-    print(f"Processing {video_path} - Total frames: {total_frames}, FPS: {fps}")
+    logger.info("Processing %s - Total frames: %d, FPS: %s", video_path, total_frames, fps)
+
+    if positions is None:
+        positions = plan_sample_positions(total_frames, fps, frame_interval, time_interval, max_frames)
+    current = 0  # index of the next frame the capture will return
+    extracted = 0
+
+    try:
+        for target in positions:
+            if target < current or target - current > seek_threshold:
+                video.set(cv2.CAP_PROP_POS_FRAMES, target)
+                current = target
+            else:
+                while current < target and video.grab():
+                    current += 1
+                if current < target:
+                    break
+
+            ret, frame = video.read()
+            if not ret:
+                break
+            current += 1
+
+            if max_dimension is not None:
+                frame = downscale_frame(frame, max_dimension)
+
+            extracted += 1
+            yield target, frame
+    finally:
+        # Release the video capture object
+        video.release()
+        logger.info("Extracted %d frames from %s", extracted, video_path)
+        count('frames_decoded', extracted, pipeline='deepfake')
+
+
+def downscale_frame(frame, max_dimension):
+    """Resize a frame so its longest side is at most `max_dimension`, keeping the aspect ratio."""
+    height, width = frame.shape[:2]
+    scale = max_dimension / max(height, width)
+    if scale >= 1:
+        return frame
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
 
-    frames = []
-    count = 0
 
-    while True:
-        ret, frame = video.read()
-        if not ret:
-            break
+def extract_frames_from_video(video_path, frame_interval=15):
+    """
+    Extract frames from a single video and return them as a list for later processing.
 
-        # Extract the frame every `frame_interval` frames
-        if count % frame_interval == 0:
-            frames.append(frame)
+    Args:
+    - video_path (str): Path to the input video file.
+    - frame_interval (int): Interval for frame extraction (e.g., extract every 30th frame).
 
-        count += 1
+    Returns:
+    - frames (list): A list of frames extracted from the video.
+    """
+    return [frame for _, frame in iter_video_frames(video_path, frame_interval=frame_interval)]
+
+def clamp_box(box, frame_shape):
+    """
+    Clip an (x, y, w, h) box to the frame. MTCNN can return negative coordinates for faces
+    touching the border, which would otherwise give empty or wrapped slices.
+    Returns None if nothing of the box is left inside the frame.
+    """
+    x, y, w, h = box
+    height, width = frame_shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + w), min(height, y + h)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+_shared_mtcnn_lock = threading.Lock()
 
-    # Release the video capture object
-    video.release()
+def detect_best_face(frame, detect_dimension=None, detector=None):
+    """
+    Detect faces in one frame and return the box of the most confident one, in full-resolution
+    coordinates and clamped to the frame, or None if no face was found.
+    :param detect_dimension: If set, detection runs on a copy downscaled to this longest side.
+    :param detector: MTCNN instance owned by the caller's thread (the shared one by default, used under a lock).
+    """
+    small = frame if detect_dimension is None else downscale_frame(frame, detect_dimension)
+    if detector is None:
+        # The shared MTCNN is not thread-safe, concurrent jobs take turns
+        with _shared_mtcnn_lock:
+            faces = registry.get('mtcnn').detect_faces(small)
+    else:
+        faces = detector.detect_faces(small)
+    if not faces:
+        return None
+
+    best = max(faces, key=lambda face: face['confidence'])
+    if best['confidence'] <= 0:
+        return None
+
+    return scale_box(best['box'], small.shape, frame.shape)
+
+
+def scale_box(box, small_shape, frame_shape):
+    """Map an (x, y, w, h) box found on a downscaled copy back to the full frame, clamped to it."""
+    if box is None:
+        return None
+    scale = frame_shape[1] / small_shape[1]
+    return clamp_box([round(value * scale) for value in box], frame_shape)
+
+
+_thread_detectors = threading.local()
+_detection_pools = {}
+_detection_pools_lock = threading.Lock()
+
+def _detect_in_thread(frame, detect_dimension):
+    # Each pool thread gets its own MTCNN so detections in the pool run in parallel without the shared lock
+    if not hasattr(_thread_detectors, 'mtcnn'):
+        _thread_detectors.mtcnn = _load_mtcnn()
+    return detect_best_face(frame, detect_dimension, _thread_detectors.mtcnn)
+
+def _detect_in_process(frame, detect_dimension):
+    return detect_best_face(frame, detect_dimension)
+
+def _get_detection_pool(executor, workers):
+    """Worker pools are created once and reused, so worker processes only load MTCNN once."""
+    with _detection_pools_lock:
+        key = (executor, workers)
+        if key not in _detection_pools:
+            if executor == 'process':
+                # spawn: forking a process that already initialised TensorFlow can deadlock
+                _detection_pools[key] = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            elif executor == 'thread':
+                _detection_pools[key] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mtcnn')
+            else:
+                raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'")
+        return _detection_pools[key]
+
+def detect_faces_in_frames(frames, detect_dimension=None, workers=1, executor='thread'):
+    """
+    Run best-face detection over a stream of frames.
+    :param frames: Iterable of frames, consumed lazily.
+    :param detect_dimension: Longest side of the downscaled copy used for detection (None = full resolution).
+    :param workers: Number of frames detected in parallel.
+    :param executor: 'thread' or 'process' pool when workers > 1.
+    :return: Iterator of (frame, box) pairs in frame order; box is None when no face was found.
+    """
+    if workers <= 1:
+        for frame in frames:
+            yield frame, detect_best_face(frame, detect_dimension)
+        return
+
+    pool = _get_detection_pool(executor, workers)
+
+    def submit(frame):
+        if executor != 'process':
+            return frame.shape, pool.submit(_detect_in_thread, frame, detect_dimension)
+        # Frames are pickled to the worker processes, so only the downscaled copy is sent
+        small = frame if detect_dimension is None else downscale_frame(frame, detect_dimension)
+        return small.shape, pool.submit(_detect_in_process, small, None)
+
+    # Keep only a few frames in flight so memory stays bounded, and yield them in submission order
+    pending = deque()
+    for frame in frames:
+        pending.append((frame, *submit(frame)))
+        if len(pending) >= 2 * workers:
+            frame, detected_shape, future = pending.popleft()
+            yield frame, scale_box(future.result(), detected_shape, frame.shape)
+    while pending:
+        frame, detected_shape, future = pending.popleft()
+        yield frame, scale_box(future.result(), detected_shape, frame.shape)
+
+class FaceTracker:
+    """
+    Detect-then-track face localisation over consecutive sampled frames.
 
-    print(f"Extracted {len(frames)} frames from {video_path}")
+    MTCNN runs on keyframes only: every `keyframe_interval`-th frame, whenever no face is being tracked,
+    and whenever tracking fails. In between, the face box of the last keyframe is found again by
+    normalised template matching in a window around its previous position, on small grayscale copies.
+    A match scoring below `min_score` counts as lost and triggers a detection on that frame.
 
-    return frames
+    Args:
+    - keyframe_interval (int): Frames per detection when tracking succeeds.
+    - detect_dimension (int): Longest side MTCNN works on, see `detect_best_face`.
+    - min_score (float): Lowest TM_CCOEFF_NORMED score accepted as the same face.
+    - search_margin (float): The search window extends the previous box by this fraction of its size.
+    - template_size (int): Longest side of the downscaled template.
+    """
 
-def extract_highest_confidence_face_from_frames(frames):
+    def __init__(self, keyframe_interval=4, detect_dimension=None, min_score=0.6, search_margin=0.5,
+                 template_size=48, detector=None):
+        self.keyframe_interval = keyframe_interval
+        self.detect_dimension = detect_dimension
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.template_size = template_size
+        self.detector = detector
+        self.frames = 0
+        self.detections = 0
+        self.tracked = 0
+        self._box = None
+        self._template = None
+        self._scale = 1.0
+        self._since_keyframe = 0
+
+    def update(self, frame):
+        """Return the face box (x, y, w, h) in `frame`, or None if there is no face."""
+        self.frames += 1
+        if self._template is not None and self._since_keyframe < self.keyframe_interval - 1:
+            box = self._match(frame)
+            if box is not None:
+                self._box = box
+                self._since_keyframe += 1
+                self.tracked += 1
+                return box
+
+        box = detect_best_face(frame, self.detect_dimension, self.detector)
+        self.detections += 1
+        self._since_keyframe = 0
+        self._set_template(frame, box)
+        return box
+
+    def _gray(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+
+    def _set_template(self, frame, box):
+        self._box = box
+        if box is None:
+            self._template = None
+            return
+        x, y, w, h = box
+        self._scale = min(1.0, self.template_size / max(w, h))
+        self._template = self._gray(frame[y:y+h, x:x+w])
+
+    def _match(self, frame):
+        x, y, w, h = self._box
+        height, width = frame.shape[:2]
+        x0, y0 = max(0, x - int(w * self.search_margin)), max(0, y - int(h * self.search_margin))
+        x1, y1 = min(width, x + w + int(w * self.search_margin)), min(height, y + h + int(h * self.search_margin))
+
+        window = self._gray(frame[y0:y1, x0:x1])
+        if window.shape[0] < self._template.shape[0] or window.shape[1] < self._template.shape[1]:
+            return None
+        scores = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (best_x, best_y) = cv2.minMaxLoc(scores)
+        if score < self.min_score:
+            return None
+        return clamp_box([x0 + round(best_x / self._scale), y0 + round(best_y / self._scale), w, h], frame.shape)
+
+    def report(self):
+        """Log and count the MTCNN calls saved by tracking."""
+        if self.frames:
+            logger.info("Face tracking ran MTCNN on %d of %d frames (%d tracked)", self.detections, self.frames,
+                        self.tracked)
+        count('detections_saved', self.frames - self.detections, pipeline='deepfake')
+
+
+def iter_best_faces(frames, detect_dimension=None, workers=1, executor='thread', keyframe_interval=0,
+                    crop_size=None):
+    """
+    Yield the highest confidence face of each frame as soon as it is found, see
+    extract_highest_confidence_face_from_frames for the arguments.
+    :return: Iterator of (i, face_crop), i being the position in `frames` of the frame the face was found in.
+    """
+    tracker = None
+    if keyframe_interval > 1:
+        tracker = FaceTracker(keyframe_interval, detect_dimension)
+        detections = ((frame, tracker.update(frame)) for frame in frames)
+    else:
+        detections = detect_faces_in_frames(frames, detect_dimension, workers, executor)
+
+    try:
+        for i, (frame, box) in enumerate(detections):
+            if box is not None:
+                x, y, w, h = box
+                # Copy (or resize) so the full frame can be freed as soon as the crop exists
+                if crop_size is None:
+                    yield i, frame[y:y+h, x:x+w].copy()
+                else:
+                    yield i, cv2.resize(frame[y:y+h, x:x+w], (crop_size, crop_size))
+    finally:
+        if tracker is not None:
+            tracker.report()
+
+
+def extract_highest_confidence_face_from_frames(frames, detect_dimension=None, workers=1, executor='thread',
+                                                keyframe_interval=0, max_faces=None, crop_size=None):
     """
     Extract the face with the highest confidence score from a list of frames using MTCNN.
-    :param frames: List of frames (images) extracted from the video.
+    :param frames: List or iterator of frames (images) extracted from the video. Frames are consumed one by one.
+    :param detect_dimension: Detect on frames downscaled to this longest side; crops are still taken at full resolution.
+    :param workers: Number of frames detected in parallel.
+    :param executor: 'thread' or 'process' pool when workers > 1.
+    :param keyframe_interval: If above 1, run MTCNN on keyframes only and track the face in between
+                              (see FaceTracker). Tracking is sequential, so `workers` is not used then.
+    :param max_faces: Stop reading frames once this many faces have been found.
+    :param crop_size: Store each crop resized to crop_size x crop_size instead of at full resolution.
     :return: List of the highest confidence face images from each frame.
     """
-    mtcnn = MTCNN()
-
     face_images = []
 
-    for idx, frame in enumerate(frames):
-        faces = mtcnn.detect_faces(frame)
-
-        if faces:
-            highest_confidence_face = None
-            max_confidence = 0  # Variable to store the highest confidence
-
-            for face in faces:
-                confidence = face['confidence']
-                if confidence > max_confidence:
-                    max_confidence = confidence
-                    highest_confidence_face = face
+    with contextlib.closing(iter_best_faces(frames, detect_dimension, workers, executor, keyframe_interval,
+                                            crop_size)) as faces:
+        for _, face_crop in faces:
+            face_images.append(face_crop)
+            if max_faces is not None and len(face_images) >= max_faces:
+                break
 
-            if highest_confidence_face:
-                x, y, w, h = highest_confidence_face['box']
-                face_crop = frame[y:y+h, x:x+w]
-                face_images.append(face_crop)
-
-    print(f"Extracted {len(face_images)} faces with the highest confidence.")
+    logger.info("Extracted %d faces with the highest confidence.", len(face_images))
+    count('faces_found', len(face_images), pipeline='deepfake')
     return face_images
 
 
 def preprocess_image(image):
+    from tensorflow.keras.applications.resnet50 import preprocess_input
     image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     image_resized = cv2.resize(image_rgb, (224, 224))
     image_preprocessed = preprocess_input(image_resized)
@@ -89,46 +474,432 @@ def preprocess_image(image):
 
     return image_batch
 
-def feature_extraction(faces):
-    features = []
-
-    model = ResNet50(weights='imagenet', include_top=False, pooling='avg')
-    feature_extractor = Model(inputs=model.input, outputs=model.output)
+def preprocess_faces(faces, size=224):
+    """
+    Preprocess all face crops at once into a single (N, size, size, 3) float32 batch.
 
-    for face in faces:
-        face_n = preprocess_image(face)
-        face_feature = feature_extractor.predict(face_n)
-        features.append(face_feature)
+    Gives the same result as `preprocess_image` on each face: ResNet50's `preprocess_input` flips
+    RGB back to BGR and subtracts the ImageNet channel means, so the BGR crops only need to be
+    resized into the batch and have the means subtracted in one vectorized step.
+    """
+    batch = np.empty((len(faces), size, size, 3), dtype=np.float32)
+    for i, face in enumerate(faces):
+        batch[i] = cv2.resize(face, (size, size))
+    batch -= IMAGENET_BGR_MEAN
+    return batch
+
+def resnet_features(batch):
+    """Run ResNet50 on a preprocessed (N, 224, 224, 3) batch and return (N, 2048) features."""
+    feature_extractor = registry.get('resnet50_features')
+    # Call the model directly: predict() has a large fixed cost per call
+    return np.asarray(feature_extractor(batch, training=False))
+
+def feature_extraction(faces, batch_size=32, extractor=None, max_length=None, dtype=np.float32):
+    """
+    Extract ResNet50 features for every face crop.
+    :param faces: List of BGR face crops.
+    :param batch_size: Number of faces sent to ResNet50 in one call.
+    :param extractor: Function mapping a preprocessed batch to its features (`resnet_features` by default),
+                      e.g. a micro-batcher that merges the faces of concurrent jobs.
+    :param max_length: If set, features are written into a preallocated zero-padded (1, max_length, 2048)
+                       buffer, the input classify_features needs, and faces beyond max_length are skipped.
+    :param dtype: Dtype of the returned features, e.g. float16 to halve their memory.
+    :return: Array of shape (1, N, 2048), or (1, max_length, 2048).
+    """
+    extractor = extractor or resnet_features
 
-    features = np.concatenate(features, axis=0)
+    if max_length is None:
+        features = np.empty((1, len(faces), FEATURE_DIM), dtype=dtype)
+    else:
+        faces = faces[:max_length]
+        features = np.zeros((1, max_length, FEATURE_DIM), dtype=dtype)
 
-    features = np.expand_dims(features, axis=0)
+    for start in range(0, len(faces), batch_size):
+        # Only one chunk of preprocessed 224x224 float images exists at a time
+        chunk = preprocess_faces(faces[start:start + batch_size])
+        features[0, start:start + len(chunk)] = extractor(chunk)
 
     return features
 
-def prediction(video_path):
-    # Load the saved model
-    model = load_model('my_model.keras')
+def pad_features(features, max_length=MAX_SEQUENCE_LENGTH):
+    """
+    Zero-pad or truncate (1, N, 2048) features to (1, max_length, 2048), keeping the first faces,
+    like Keras `pad_sequences(..., padding='post', truncating='post')`. Features that already have that
+    shape and dtype are returned as they are.
+    """
+    if features.shape[1] == max_length and features.dtype == np.float32:
+        return features
+    padded = np.zeros((len(features), max_length, features.shape[-1]), dtype=np.float32)
+    length = min(features.shape[1], max_length)
+    padded[:, :length] = features[:, :length]
+    return padded
+
+def classify_features(features, max_length=MAX_SEQUENCE_LENGTH):
+    """
+    Run the LSTM classifier on a (1, N, 2048) feature sequence, padded or truncated to `max_length`.
+    :return: Array of shape (1, 1) with the probability that the video is fake.
+    """
+    model = registry.get('deepfake_classifier')
+    # Call the model directly, like resnet_features
+    return np.asarray(model(pad_features(features, max_length), training=False))
+
+def classifier_version():
+    """Content digest of the saved LSTM model, so cached verdicts are dropped when the model changes."""
+    return file_digest(CLASSIFIER_PATH) if os.path.exists(CLASSIFIER_PATH) else None
+
+def model_versions():
+    """Versions of the feature extractor and classifier in use, for the cache keys of their stages."""
+    if INFERENCE_BACKEND == 'tflite':
+        from tflite_backend import artifact_version
+        return artifact_version('resnet50_features'), artifact_version('deepfake_classifier')
+    return 'resnet50-imagenet-avg', classifier_version()
+
+def report_sampling(processed, total_frames, mode):
+    """Log and count how many frames a sampling mode processed against the fixed-interval baseline."""
+    baseline = -(-total_frames // FRAME_INTERVAL) if total_frames > 0 else None
+    if baseline:
+        logger.info("%s sampling processed %d frames (fixed-interval baseline: %d, %.0f%% saved)",
+                    mode.capitalize(), processed, baseline, 100 * (1 - processed / baseline))
+        count('frames_saved', max(0, baseline - processed), pipeline='deepfake', sampling=mode)
+    count('frames_processed', processed, pipeline='deepfake', sampling=mode)
+
+
+def coarse_to_fine_passes(length, first_stride=8):
+    """
+    Split range(length) into passes of halving stride, e.g. [0, 8, 16, ...], [4, 12, ...], [2, 6, ...],
+    [1, 3, ...]. Every pass spreads over the whole range, so the first passes form an even subsample.
+    """
+    stride = first_stride
+    passes = [list(range(0, length, stride))]
+    while stride > 1:
+        half = stride // 2
+        passes.append(list(range(half, length, stride)))
+        stride = half
+    return [indices for indices in passes if indices]
+
+
+def sample_faces_with_early_exit(video_path, control=None, extractor=None, max_frames=MAX_SEQUENCE_LENGTH,
+                                 first_stride=8, min_confidence=EARLY_EXIT_MIN_CONFIDENCE,
+                                 tolerance=EARLY_EXIT_TOLERANCE):
+    """
+    Adaptive sampling that stops as soon as the verdict is stable.
+
+    The `max_frames` positions spread over the video are visited coarse to fine (see
+    `coarse_to_fine_passes`). After each pass the faces found so far are classified in temporal order,
+    and sampling stops once two consecutive verdicts differ by at most `tolerance` with a confidence
+    (distance from 0.5, scaled to [0, 1]) of at least `min_confidence`.
+
+    :return: (faces, features, predictions, frames_processed) with faces in temporal order, features of
+             shape (1, N, 2048) and predictions of shape (1, 1) for those features.
+    :raises ValueError: If no face is found in any sampled frame.
+    """
+    control = control or JobControl()
+    total_frames, fps = video_properties(video_path)
+    # The islice bounds the plan when the frame count is unknown
+    plan = plan_sample_positions(total_frames, fps, FRAME_INTERVAL, max_frames=max_frames)
+    positions = list(itertools.islice(plan, max_frames))
+
+    found = {}  # frame index -> (face crop, features)
+    processed = 0
+    previous = None
+    predictions = None
+
+    for indices in coarse_to_fine_passes(len(positions), first_stride):
+        decoded = []
+
+        def frames():
+            pass_positions = [positions[i] for i in indices]
+            for position, frame in control.watch(iter_video_frames(video_path, positions=pass_positions)):
+                decoded.append(position)
+                yield frame
+
+        new_positions, new_faces = [], []
+        detections = detect_faces_in_frames(frames(), DETECTION_MAX_DIMENSION, DETECTION_WORKERS, DETECTION_EXECUTOR)
+        for i, (frame, box) in enumerate(detections):
+            processed += 1
+            if box is not None:
+                x, y, w, h = box
+                new_positions.append(decoded[i])
+                new_faces.append(frame[y:y+h, x:x+w].copy())
+
+        if not new_faces:
+            continue
+        new_features = feature_extraction(new_faces, extractor=extractor)[0]
+        for position, face, features in zip(new_positions, new_faces, new_features):
+            found[position] = (face, features)
+
+        sequence = np.stack([found[position][1] for position in sorted(found)])[np.newaxis]
+        predictions = classify_features(sequence)
+        probability = float(np.asarray(predictions).ravel()[0])
+        if (previous is not None and abs(probability - previous) <= tolerance
+                and abs(probability - 0.5) * 2 >= min_confidence):
+            logger.info("Verdict stable at %.3f after %d faces, stopping early", probability, len(found))
+            break
+        previous = probability
 
-    video_capture = cv2.VideoCapture(video_path)
+    if not found:
+        raise ValueError(f"No faces found in {video_path}")
+    faces = [found[position][0] for position in sorted(found)]
+    features = np.stack([found[position][1] for position in sorted(found)])[np.newaxis]
 
-    frames_list = extract_frames_from_video(video_path)
-    faces = extract_highest_confidence_face_from_frames(frames_list)
-    ResNet_features = feature_extraction(faces)
-    max_length = 108
-    features_padded = pad_sequences(ResNet_features, maxlen=max_length, dtype='float32', padding='post', truncating='post')
-    predictions = model.predict(np.array(features_padded))
+    report_sampling(processed, total_frames, 'early-exit')
+    return faces, features, predictions, processed
+
+
+def sample_faces(video_path, control, mode=None, max_faces=None, crop_size=None, media=None):
+    """
+    Detect the best face in the frames chosen by the sampling mode ("interval" or "adaptive",
+    SAMPLING_MODE by default) and return the face crops in temporal order.
+    `max_faces` and `crop_size` bound the memory, see extract_highest_confidence_face_from_frames.
+    With a media_ingest.MediaIngest as `media`, frames come from its single pass over the file.
+    """
+    mode = mode or SAMPLING_MODE
+    options = {'max_faces': max_faces, 'crop_size': crop_size}
+
+    def sampled_frames(**sampling):
+        if media is None:
+            return iter_video_frames(video_path, **sampling)
+        total_frames, fps = media.properties()
+        return media.frames(plan_sample_positions(total_frames, fps, **sampling))
+
+    if mode == 'adaptive':
+        total_frames, _ = video_properties(video_path) if media is None else media.properties()
+        processed = 0
+
+        def frames():
+            nonlocal processed
+            for _, frame in control.watch(sampled_frames(max_frames=MAX_SEQUENCE_LENGTH)):
+                processed += 1
+                yield frame
+
+        faces = extract_highest_confidence_face_from_frames(
+            frames(), DETECTION_MAX_DIMENSION, DETECTION_WORKERS, DETECTION_EXECUTOR, KEYFRAME_INTERVAL, **options)
+        report_sampling(processed, total_frames, mode)
+        return faces
+    if mode != 'interval':
+        raise ValueError(f"Unknown sampling mode '{mode}', expected 'interval' or 'adaptive'")
+
+    # Frames are decoded lazily and handed to the face detector one at a time
+    return extract_highest_confidence_face_from_frames(
+        control.watch(frame for _, frame in sampled_frames(frame_interval=FRAME_INTERVAL)),
+        DETECTION_MAX_DIMENSION, DETECTION_WORKERS, DETECTION_EXECUTOR, KEYFRAME_INTERVAL, **options)
+
+
+def prediction(video_path, cache=None, control=None, extractor=None, media=None):
+    """
+    Predict whether a video is deepfaked.
+    :param video_path: Path to the video file.
+    :param cache: Optional ResultCache. Face crops, features and the verdict are cached by video content,
+                  so a repeated video skips every stage whose inputs did not change.
+    :param control: Optional JobControl that receives stage progress and can cancel the run.
+    :param extractor: Optional replacement for `resnet_features`, see `feature_extraction`.
+    :param media: Optional media_ingest.MediaIngest the frames are read from, shared with the fake news
+                  pipeline. Early exit needs random access, so it releases `media` and reads the file itself.
+    :return: Array of shape (1, 1) with the probability that the video is fake.
+    :raises ValueError: If no face is found in the sampled frames.
+    """
+    control = control or JobControl()
+    chain = StageChain(cache, video_path, 'deepfake', control)
+    early_exit = SAMPLING_MODE == 'adaptive' and EARLY_EXIT
+
+    # With early exit the features and verdict are computed while sampling
+    streamed = {}
+
+    # Memory-bounded mode keeps the first MAX_SEQUENCE_LENGTH faces at the ResNet input size
+    bounded = {'max_faces': MAX_SEQUENCE_LENGTH, 'crop_size': RESNET_INPUT_SIZE} if MEMORY_BOUNDED else {}
+    buffer = {'max_length': MAX_SEQUENCE_LENGTH, 'dtype': FEATURE_DTYPE} if MEMORY_BOUNDED else {}
+
+    def faces_for_video():
+        if not early_exit:
+            return sample_faces(video_path, control, media=media, **bounded)
+        if media is not None:
+            media.release('video')
+        faces, streamed['features'], streamed['verdict'], _ = sample_faces_with_early_exit(
+            video_path, control, extractor)
+        return faces
+
+    # Only non-default settings join the cache key, so existing entries stay valid
+    feature_model, classifier_model = model_versions()
+    sampling = {'sampling': SAMPLING_MODE, 'early_exit': early_exit} if SAMPLING_MODE != 'interval' else {}
+    if not early_exit:
+        # Early exit samples its own frames and ignores the face bounds
+        sampling.update(bounded)
+        if KEYFRAME_INTERVAL > 1:
+            sampling['keyframe_interval'] = KEYFRAME_INTERVAL
+    faces = chain.stage(
+        'faces', faces_for_video,
+        frame_interval=FRAME_INTERVAL, detect_dimension=DETECTION_MAX_DIMENSION, **sampling)
+    def features_for_faces():
+        if 'features' in streamed:
+            return streamed['features']
+        face_crops = faces.value()
+        if not len(face_crops):
+            raise ValueError(f"No faces found in {video_path}")
+        return feature_extraction(face_crops, extractor=extractor, **buffer)
+
+    features = chain.stage('features', features_for_faces, parents=[faces], model=feature_model, **buffer)
+    verdict = chain.stage(
+        'verdict',
+        lambda: streamed['verdict'] if 'verdict' in streamed else classify_features(features.value()),
+        parents=[features], model=classifier_model, max_length=MAX_SEQUENCE_LENGTH)
+
+    predictions = np.asarray(verdict.value())
     pred = (predictions > 0.5).astype(int)
 
     if pred == 1:
-        print("This video is FAKE")
+        logger.info("This video is FAKE")
     elif pred == 0:
-        print("This video is REAL")
+        logger.info("This video is REAL")
+    count('verdicts', pipeline='deepfake', verdict='FAKE' if pred == 1 else 'REAL')
 
     return predictions
 
 
+def timeline_features(video_path, control=None, extractor=None, batch_size=32, dtype=np.float32, media=None):
+    """
+    ResNet50 features of the best face of every sampled frame of the whole video.
+
+    Faces are turned into features batch by batch while detection goes on, so only one batch of crops
+    exists at a time, and every face is run through ResNet50 exactly once. The features are written
+    into one buffer sized for the number of sampled frames (grown if the container under-reports it).
+
+    :return: [positions, features]: the frame index of every face, shape (N,), and their features,
+             shape (N, 2048), in temporal order.
+    """
+    control = control or JobControl()
+    total_frames, fps = video_properties(video_path) if media is None else media.properties()
+    plan = plan_sample_positions(total_frames, fps, FRAME_INTERVAL)
+    sampled = []
+
+    def frames():
+        source = iter_video_frames(video_path, positions=plan) if media is None else media.frames(plan)
+        for position, frame in control.watch(source):
+            sampled.append(position)
+            yield frame
+
+    buffer = np.empty((-(-total_frames // FRAME_INTERVAL) if total_frames > 0 else 1024, FEATURE_DIM), dtype=dtype)
+    positions = []
+    pending = []
+
+    def flush():
+        nonlocal buffer
+        start = len(positions) - len(pending)
+        while start + len(pending) > len(buffer):
+            buffer = np.concatenate([buffer, np.empty_like(buffer)])
+        buffer[start:start + len(pending)] = feature_extraction(pending, batch_size, extractor, dtype=dtype)[0]
+        pending.clear()
+
+    faces = iter_best_faces(frames(), DETECTION_MAX_DIMENSION, DETECTION_WORKERS, DETECTION_EXECUTOR,
+                            KEYFRAME_INTERVAL, crop_size=RESNET_INPUT_SIZE)
+    for i, face in faces:
+        positions.append(sampled[i])
+        pending.append(face)
+        if len(pending) == batch_size:
+            flush()
+    if pending:
+        flush()
+
+    logger.info("Extracted features of %d faces for the timeline", len(positions))
+    count('faces_found', len(positions), pipeline='deepfake')
+    return [np.asarray(positions, dtype=np.int64), buffer[:len(positions)]]
+
+
+def check_stride(stride):
+    """Return `stride`, TIMELINE_STRIDE if it is None, raising ValueError unless it is at least one face."""
+    if stride is None:
+        if TIMELINE_STRIDE < 1:
+            raise ValueError(f"TRUTHLENS_TIMELINE_STRIDE must be at least 1, got {TIMELINE_STRIDE}")
+        return TIMELINE_STRIDE
+    if stride < 1:
+        raise ValueError(f"Window stride must be at least 1 face, got {stride}")
+    return stride
+
+
+def window_starts(length, window=MAX_SEQUENCE_LENGTH, stride=None):
+    """Start of every `window`-face window, `stride` apart, the last one ending at the last face."""
+    stride = check_stride(stride)
+    if length <= window:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.arange(0, length - window + 1, stride)
+    if starts[-1] != length - window:
+        starts = np.append(starts, length - window)
+    return starts
+
+
+def score_windows(features, window=MAX_SEQUENCE_LENGTH, stride=None, batch_size=16):
+    """
+    Run the LSTM over overlapping windows of a (N, 2048) feature sequence.
+
+    Windows are views into `features`; only `batch_size` of them are copied at a time into the batch
+    sent to the classifier, so memory stays flat and the cost grows linearly with N. A sequence shorter
+    than `window` is zero-padded into a single window, which gives the same score as classify_features.
 
+    :return: (starts, probabilities): first face of each window and its fake probability.
+    """
+    model = registry.get('deepfake_classifier')
+    starts = window_starts(len(features), window, stride)
+    if len(features) < window:
+        return starts, np.asarray(model(pad_features(features[np.newaxis], window), training=False)).reshape(-1)
 
+    windows = np.lib.stride_tricks.sliding_window_view(features, window, axis=0).transpose(0, 2, 1)
+    probabilities = np.empty(len(starts), dtype=np.float32)
+    for i in range(0, len(starts), batch_size):
+        batch = windows[starts[i:i + batch_size]].astype(np.float32)
+        probabilities[i:i + len(batch)] = np.asarray(model(batch, training=False)).reshape(-1)
+    return starts, probabilities
 
 
+def timeline_prediction(video_path, cache=None, control=None, extractor=None, window=MAX_SEQUENCE_LENGTH,
+                        stride=None, aggregate='max', media=None):
+    """
+    Score a whole video segment by segment, for videos longer than the MAX_SEQUENCE_LENGTH faces
+    `prediction` looks at.
+
+    Every sampled frame is used: the features of each face are computed once (`timeline_features`) and the
+    LSTM scores overlapping `window`-face windows `stride` faces apart (TRUTHLENS_TIMELINE_STRIDE, half a
+    window by default) in batches (`score_windows`).
+
+    :param cache: Optional ResultCache, the features and the window scores are cached by video content.
+    :param aggregate: How the window scores make the video's score: 'max' (the most suspicious segment)
+                      or 'mean'.
+    :param media: Optional media_ingest.MediaIngest the frames are read from, see `prediction`.
+    :return: (segments, predictions): segments of shape (W, 3) holding the start and end time in seconds
+             and the fake probability of each window, and the aggregate probability of shape (1, 1).
+    """
+    if aggregate not in ('max', 'mean'):
+        raise ValueError(f"Unknown aggregate '{aggregate}', expected 'max' or 'mean'")
+    control = control or JobControl()
+    # Checked before the features are computed, not when the windows are scored
+    stride = check_stride(stride)
+    chain = StageChain(cache, video_path, 'deepfake', control)
+    feature_model, classifier_model = model_versions()
+
+    sampling = {'keyframe_interval': KEYFRAME_INTERVAL} if KEYFRAME_INTERVAL > 1 else {}
+    features = chain.stage(
+        'timeline_features',
+        lambda: timeline_features(video_path, control, extractor, dtype=FEATURE_DTYPE, media=media),
+        frame_interval=FRAME_INTERVAL, detect_dimension=DETECTION_MAX_DIMENSION, model=feature_model,
+        dtype=FEATURE_DTYPE, **sampling)
+
+    def score():
+        positions, face_features = features.value()
+        if not len(positions):
+            raise ValueError(f"No faces found in {video_path}")
+        starts, probabilities = score_windows(face_features, window, stride)
+        ends = np.minimum(starts + window, len(positions)) - 1
+        _, fps = video_properties(video_path) if media is None else media.properties()
+        fps = fps or 1.0
+        return np.stack([positions[starts] / fps, (positions[ends] + 1) / fps, probabilities], axis=1)
+
+    segments = chain.stage(
+        'timeline', score, parents=[features], model=classifier_model, window=window, stride=stride)
+
+    segments = np.asarray(segments.value())
+    scores = segments[:, 2]
+    probability = scores.max() if aggregate == 'max' else scores.mean()
+    predictions = np.array([[probability]], dtype=np.float32)
+
+    logger.info("Timeline of %d segments, %d above 0.5, %s %.4f: this video is %s", len(segments),
+                int(np.sum(scores > 0.5)), aggregate, probability, "FAKE" if probability > 0.5 else "REAL")
+    count('verdicts', pipeline='deepfake', verdict='FAKE' if probability > 0.5 else 'REAL', mode='timeline')
+    return segments, predictions
@@ -1,143 +1,422 @@
-from moviepy import *
-from moviepy.video.io.VideoFileClip import VideoFileClip
-import whisper
-import string
-from transformers import pipeline
-from keybert import KeyBERT
-from sentence_transformers import SentenceTransformer, util
-
-import requests
+import logging
 import os
+import queue
+import shutil
+import subprocess
+import threading
+from datetime import date
 from dotenv import load_dotenv
+import numpy as np
+
+from article_index import ARTICLE_INDEX, default_article_index
+from instrumentation import count
+from model_registry import registry
+from news_client import default_news_client
+from pipeline_control import JobCancelled
+from result_cache import StageChain
+from summarization import SUMMARIZER_BACKEND, summarize
 
 # Load environment variables from .env file
 load_dotenv()
 
-def preprocess_video(video_path):
-    video_clip = VideoFileClip(video_path)
-
-    # Extract audio
-    audio_clip = video_clip.audio
-
-    # Save the audio to a file
-    audio_output_path = "output_audio.mp3"  # Specify output file path and format
-    audio_clip.write_audiofile(audio_output_path)
+# Whisper works on 16 kHz mono audio
+SAMPLE_RATE = 16000
+# Transcribe in chunks and extract keywords while transcription is still running
+STREAMING_TRANSCRIPTION = os.getenv('TRUTHLENS_STREAMING_TRANSCRIPTION', '0') == '1'
+# Sentence embedding model shared by keyword extraction, article ranking and the extractive summarizer
+EMBEDDING_MODEL = os.getenv('TRUTHLENS_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+# With the article index enabled, keywords searched less than this many seconds ago are not sent to the news API
+ARTICLE_INDEX_REFRESH = int(os.getenv('TRUTHLENS_ARTICLE_INDEX_REFRESH', '21600'))
+
+logger = logging.getLogger(__name__)
+
+# transcribe() installs KV-cache hooks on the shared decoder, so concurrent jobs must take turns
+_whisper_lock = threading.Lock()
+
+
+# Whisper, KeyBERT and sentence-transformers are imported by the loaders, so importing this module stays cheap
+def _load_whisper():
+    import whisper
+    return whisper.load_model("base")
+
+def _load_keybert():
+    from keybert import KeyBERT
+    # KeyBERT wraps the resident sentence model instead of loading its own copy of the encoder
+    return KeyBERT(model=registry.get('sentence_model'))
+
+def _load_sentence_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+# Models are loaded once on first use and shared by every detection
+registry.register('whisper_base', _load_whisper)
+registry.register('keybert', _load_keybert)
+registry.register('sentence_model', _load_sentence_model)
+
+
+def import_backends():
+    """Import the libraries the models need without loading any model, see job_runner.preload_pipelines."""
+    import keybert
+    import sentence_transformers
+    import whisper
+    if SUMMARIZER_BACKEND != 'extractive':
+        import transformers.pipelines
+
+def _ffmpeg_executable():
+    if shutil.which("ffmpeg"):
+        return "ffmpeg"
+    # moviepy installs a bundled ffmpeg through imageio-ffmpeg
+    from imageio_ffmpeg import get_ffmpeg_exe
+    return get_ffmpeg_exe()
+
+
+def load_audio(video_path, sample_rate=SAMPLE_RATE):
+    """
+    Decode the audio track of a video straight into memory as mono float32 PCM, the format Whisper expects.
+    The video stream is skipped (-vn) and nothing is written to disk.
+    """
+    command = [
+        _ffmpeg_executable(), "-nostdin", "-threads", "0", "-i", video_path,
+        "-vn", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-",
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio from {video_path}: {e.stderr.decode(errors='ignore')}") from e
+
+    return np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
+
+
+def iter_transcript_chunks(audio, chunk_seconds=30):
+    """
+    Transcribe audio chunk by chunk and yield the text of each chunk as soon as it is ready.
+    The end of the previous chunk is passed as prompt so the transcript stays consistent across chunks.
+    :param audio: The whole audio, or an iterable of consecutive chunks still being decoded
+                  (see media_ingest.MediaIngest.iter_audio).
+    """
+    model = registry.get('whisper_base')
+    if isinstance(audio, np.ndarray):
+        chunk_size = int(chunk_seconds * SAMPLE_RATE)
+        audio = (audio[start:start + chunk_size] for start in range(0, len(audio), chunk_size))
+    previous_text = None
+
+    for chunk in audio:
+        with _whisper_lock:
+            result = model.transcribe(chunk, initial_prompt=previous_text)
+        previous_text = result["text"]
+        yield result["text"]
+
+
+def preprocess_video(video_path, streaming=False, on_segment=None, media=None):
+    """
+    Transcribe the speech of a video.
+    :param video_path: Path to the video file.
+    :param streaming: Transcribe in 30 second chunks and report each one through `on_segment` as it is ready.
+    :param on_segment: Called with the text of each chunk in streaming mode.
+    :param media: Optional media_ingest.MediaIngest the audio is read from instead of decoding the file again.
+                  The audio is then always transcribed in 30 second chunks, each one as soon as it has been
+                  demuxed: the demux goes at the pace of face detection, so waiting for the whole track
+                  would run the two pipelines one after the other.
+    :return: The transcript.
+    """
+    # Audio to numpy, no intermediate audio file
+    audio = load_audio(video_path) if media is None else media.iter_audio(chunk_seconds=30)
 
     #Audio to text
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_output_path)
-    paragraph = result["text"]
-
-    return paragraph
+    if media is None and not streaming:
+        model = registry.get('whisper_base')
+        with _whisper_lock:
+            result = model.transcribe(audio)
+        return result["text"]
+
+    segments = []
+    for text in iter_transcript_chunks(audio, chunk_seconds=30):
+        segments.append(text)
+        if on_segment is not None:
+            on_segment(text)
+    return "".join(segments)
+
+
+def transcribe_with_keywords(video_path, top_n=5, media=None, encoder=None):
+    """
+    Streaming transcription with keyword extraction overlapped: keywords are extracted from each transcript
+    chunk while Whisper works on the next one, then merged by their length-weighted score.
+    :param encoder: Function mapping a list of texts to normalised embeddings, see `keyword_scores`.
+    :return: (transcript, keywords)
+    """
+    segments = queue.Queue()
+    errors = []
+
+    def transcribe():
+        try:
+            preprocess_video(video_path, streaming=True, on_segment=segments.put, media=media)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            segments.put(None)
+
+    thread = threading.Thread(target=transcribe, name="transcription", daemon=True)
+    thread.start()
+
+    texts = []
+    scores = {}
+    while (text := segments.get()) is not None:
+        texts.append(text)
+        weight = len(text.split())
+        if not weight:
+            continue
+        for keyword, score in keyword_scores(text, top_n=top_n * 2, encoder=encoder):
+            scores[keyword] = scores.get(keyword, 0.0) + score * weight
+
+    thread.join()
+    if errors:
+        raise errors[0]
+
+    keywords = sorted(scores, key=scores.get, reverse=True)[:top_n]
+    return "".join(texts), keywords
 
 
 def get_articles(keywords, max_results=20, sort_by="relevance"):
-    API_KEY = os.getenv('NEWSAPI_KEY')
-    if not API_KEY:
-        raise ValueError("NEWSAPI_KEY not found in environment variables. Please check your .env file.")
-    BASE_URL = 'https://newsapi.org/v2/everything'
-
-    articles = []
-    page = 1
-    query = ' OR '.join(keywords)  # Flexible matching: any keyword can appear
-
-    while len(articles) < max_results:
-        url = f"{BASE_URL}?q={query}&pageSize={min(100, max_results - len(articles))}&page={page}&sortBy={sort_by}&apiKey={API_KEY}"
-        response = requests.get(url)
-
-        if response.status_code == 200:
-            data = response.json()
-            articles.extend(data.get("articles", []))
-            if len(data.get("articles", [])) < 100:  # No more articles on next pages
-                break
-            page += 1
-        else:
-            print(f"Error fetching articles: {response.status_code} - {response.text}")
-            break
-
-    return articles[:max_results] if articles else None
+    # Pooled, retrying and cached client, see news_client.py
+    return default_news_client().search(keywords, max_results=max_results, sort_by=sort_by)
+
+
+def retrieve_articles(keywords, query_embedding, index, max_results=50, encoder=None):
+    """
+    Retrieve the articles most similar to a text from the persistent article index.
+    The news API is only queried when the keywords were not searched in the last ARTICLE_INDEX_REFRESH
+    seconds, and only the articles it returns that are not stored yet are embedded.
+    :param query_embedding: L2-normalised embedding of the text.
+    :param index: ArticleIndex, see article_index.py.
+    :param encoder: Function mapping a list of texts to normalised embeddings (`encode_texts` by default).
+    :return: (articles, embeddings, similarities), most similar first.
+    """
+    if index.fetched_within(keywords, ARTICLE_INDEX_REFRESH):
+        count('article_index_fetches_saved')
+    else:
+        fetched = get_articles(keywords, max_results=max_results)
+        # None means no results or a failed request: nothing new, but the stored articles are still searched,
+        # and the keywords are not marked so the next request tries the API again
+        if fetched is not None:
+            index.add(fetched, encoder or encode_texts, text=article_text)
+            index.mark_fetched(keywords)
+    return index.search(query_embedding, top_k=max_results)
+
+
+def rank_articles(text_embedding, article_embeddings, top_k=5):
+    """
+    Rank articles by cosine similarity to the text.
+    :param text_embedding: L2-normalised embedding of the text, shape (D,).
+    :param article_embeddings: L2-normalised article embeddings, shape (N, D).
+    :param top_k: Number of articles to return.
+    :return: (indices, scores) of the top_k most similar articles, most similar first.
+    """
+    # With normalised embeddings the cosine similarities are a single matrix-vector product
+    similarities = np.asarray(article_embeddings, dtype=np.float32) @ np.asarray(text_embedding, dtype=np.float32)
+    k = min(top_k, len(similarities))
+    if k == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=np.float32)
+
+    # Only the top k need sorting
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top])]
+    return top, similarities[top]
+
+
+def _normalize(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
 
 
 def compare_similarities(text_embedding, articles_embeddings):
-    # List to store cosine similarities
-    similarities = []
-    for article_embedding in articles_embeddings:
-        similarity = util.cos_sim(text_embedding, article_embedding).item()
-        similarities.append(similarity)
-
     # Sort articles by similarity (highest to lowest)
-    sorted_indices = sorted(range(len(similarities)), key=lambda i: similarities[i], reverse=True)
+    indices, _ = rank_articles(_normalize(text_embedding), _normalize(articles_embeddings), top_k=5)
+    return indices.tolist()
 
-    return sorted_indices[:5]
 
+def keyword_scores(paragraph, top_n=5, encoder=None):
+    """
+    Extract keywords with KeyBERT, embedding the text and all its candidate words in one batched call of
+    the shared sentence model.
+    :param encoder: Function mapping a list of texts to normalised embeddings (`encode_texts` by default).
+    :return: List of (keyword, score), best first.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    # Same candidates as KeyBERT finds itself, so the embeddings line up with its vocabulary
+    vectorizer = CountVectorizer(stop_words="english")
+    try:
+        candidates = vectorizer.fit([paragraph]).get_feature_names_out().tolist()
+    except ValueError:
+        # Nothing but stop words
+        return []
+    embeddings = np.asarray((encoder or encode_texts)([paragraph] + candidates))
 
-def fake_news_detection(video_path):
+    model = registry.get('keybert')
+    return model.extract_keywords(paragraph, vectorizer=vectorizer, top_n=top_n,
+                                  doc_embeddings=embeddings[:1], word_embeddings=embeddings[1:])
+
+
+def extract_keywords(paragraph, top_n=5, encoder=None):
+    return [keyword for keyword, _ in keyword_scores(paragraph, top_n=top_n, encoder=encoder)]
+
+
+def summarize_transcript(paragraph, cache=None):
+    return summarize([paragraph], max_length=70, min_length=50, cache=cache)[0]
+
+
+def article_text(article):
+    # Combine title, description, and content
+    return f"{article['title']} {article['description']} {article.get('content', '')}"
+
+
+def encode_texts(texts, batch_size=64):
+    """Embed texts with Sentence-BERT in batched calls. Embeddings are L2-normalised, shape (N, D)."""
+    model = registry.get('sentence_model')  # Sentence-BERT model
+    return model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+
+
+def embedding_dimension():
+    return registry.get('sentence_model').get_sentence_embedding_dimension()
+
+
+def embed_articles(articles, encoder=None):
+    """
+    Embed every article in one batched call. Embeddings are L2-normalised, shape (N, D).
+    :param encoder: Function mapping a list of texts to normalised embeddings (`encode_texts` by default),
+                    e.g. a micro-batcher that merges the texts of concurrent jobs.
+    """
+    encoder = encoder or encode_texts
+    return encoder([article_text(article) for article in articles])
+
+
+def summarize_best_articles(articles, summarized_text, article_embeddings, cache=None, encoder=None,
+                            text_embedding=None):
+    # Semantic Embedding, unless the caller already has it
+    if text_embedding is None:
+        text_embedding = (encoder or encode_texts)([summarized_text])[0]
+
+    # get the most similar articles
+    best_five_articles, similarities = rank_articles(text_embedding, article_embeddings, top_k=5)
+
+    logger.info("the most similar articles describing the content of your video are : ")
+
+    # Summarize the top articles in one batch, articles summarized before come from the cache
+    best_five_articles = best_five_articles.tolist()
+    summaries = summarize([articles[idx]['content'] or articles[idx]['description'] or articles[idx]['title']
+                           for idx in best_five_articles], max_length=100, min_length=100, cache=cache)
+
+    summarized_articles = []
+    for idx, similarity, summarized_article in zip(best_five_articles, similarities.tolist(), summaries):  # Display top 5 most similar articles
+        summarized_articles.append({
+            "title": articles[idx]['title'],
+            "summary": summarized_article,
+            "url": articles[idx]['url'],
+            "source": articles[idx]['source'],
+            "similarity": similarity
+        })
+
+        logger.info("Title: %s\nSimilarity Score: %.2f%%\nSummarized Text: %s\nURL: %s\nSOURCE: %s\n%s",
+                    articles[idx]['title'], similarity * 100, summarized_article, articles[idx]['url'],
+                    articles[idx]['source'], "=" * 80)
+
+    return summarized_articles
+
+
+def fake_news_detection(video_path, cache=None, control=None, encoder=None, media=None):
+    """
+    Transcribe a video, look up news articles about its content and summarize the most similar ones.
+    :param video_path: Path to the video file.
+    :param cache: Optional ResultCache. The transcript, keywords, articles, embeddings and final result
+                  are cached by video content, so a repeated video skips every stage whose inputs did not change.
+    :param control: Optional JobControl that receives stage progress and can cancel the run.
+    :param encoder: Optional replacement for `encode_texts`, see `embed_articles`.
+    :param media: Optional media_ingest.MediaIngest the audio is read from, shared with the deepfake pipeline.
+    :return: List of up to 5 summarized articles, or None.
+    """
+    chain = StageChain(cache, video_path, 'fakenews', control)
+    index = default_article_index(EMBEDDING_MODEL, embedding_dimension()) if ARTICLE_INDEX else None
+
+    # In streaming mode keywords are extracted while the transcription runs
+    streamed = {}
+
+    def transcribe():
+        if not STREAMING_TRANSCRIPTION:
+            return preprocess_video(video_path, media=media)
+        text, streamed['keywords'] = transcribe_with_keywords(video_path, top_n=5, media=media, encoder=encoder)
+        return text
+
+    # A shared media ingest is always transcribed chunk by chunk, see preprocess_video
+    transcript = chain.stage('transcript', transcribe, model='whisper-base',
+                             streaming=STREAMING_TRANSCRIPTION or media is not None)
+    # The default model is the one KeyBERT used on its own, so existing cache entries stay valid
+    keyword_model = 'keybert' if EMBEDDING_MODEL == 'all-MiniLM-L6-v2' else f'keybert-{EMBEDDING_MODEL}'
+    keywords = chain.stage(
+        'keywords', lambda: streamed.get('keywords') or extract_keywords(transcript.value(), top_n=5, encoder=encoder),
+        parents=[transcript], model=keyword_model, top_n=5, streaming=STREAMING_TRANSCRIPTION)
+    summarized_text = chain.stage(
+        'transcript_summary', lambda: summarize_transcript(transcript.value(), cache), parents=[transcript],
+        model=SUMMARIZER_BACKEND)
+
+    def summary_embedding():
+        # Embedded once, for both the index search and the final ranking
+        if 'summary_embedding' not in streamed:
+            streamed['summary_embedding'] = (encoder or encode_texts)([summarized_text.value()])[0]
+        return streamed['summary_embedding']
+
+    def retrieve():
+        # The index returns the stored embeddings of the articles it finds, so they are not encoded again
+        found, streamed['article_embeddings'], _ = retrieve_articles(
+            keywords.value(), summary_embedding(), index, max_results=50, encoder=encoder)
+        return found
+
+    def embed():
+        embeddings = streamed.get('article_embeddings')
+        return embeddings if embeddings is not None else embed_articles(articles.value(), encoder)
+
+    # Articles are re-fetched once a day so new coverage shows up
+    if index is None:
+        articles = chain.stage(
+            'articles', lambda: get_articles(keywords.value(), max_results=50), parents=[keywords],
+            max_results=50, fetched_on=date.today().isoformat())
+    else:
+        articles = chain.stage(
+            'articles', retrieve, parents=[keywords, summarized_text], max_results=50,
+            fetched_on=date.today().isoformat(), index=True)
+    article_embeddings = chain.stage(
+        'article_embeddings', embed, parents=[articles], version=2, model=EMBEDDING_MODEL)
+    result = chain.stage(
+        'result',
+        lambda: summarize_best_articles(
+            articles.value(), summarized_text.value(), article_embeddings.value(), cache, encoder,
+            summary_embedding()),
+        parents=[articles, summarized_text, article_embeddings], version=2, summarizer=SUMMARIZER_BACKEND)
 
     # get the transcribed text
-    paragraph = preprocess_video(video_path)
-    print(paragraph)
+    paragraph = transcript.value()
+    logger.info("%s", paragraph)
 
     # getting keywords
-    model = KeyBERT()
-    keywords = model.extract_keywords(paragraph, stop_words="english", top_n=5)
-    keywords_updated = [keyword[0] for keyword in keywords]
-    print("Keywords:", keywords_updated)
+    logger.info("Keywords: %s", keywords.value())
 
     try:
         # get Articles NewsAPI with keywords
-        articles = get_articles(keywords_updated, max_results=50)
-        if articles:
-            for article in articles:
-                print("Title:", article["title"])
-                print("Source:", article["source"]["name"])
-                print("URL:", article["url"])
-                print("=" * 80)
+        if articles.value():
+            count('articles_fetched', len(articles.value()), pipeline='fakenews')
+            for article in articles.value():
+                logger.debug("Title: %s\nSource: %s\nURL: %s\n%s",
+                             article["title"], article["source"]["name"], article["url"], "=" * 80)
         else:
-            print("No articles found.")
+            logger.info("No articles found.")
             return None
 
-        # summary of text
-        summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        summary = summarizer(paragraph, max_length=70, min_length=50, do_sample=False)
-        summarized_text = summary[0]['summary_text']
-
-        # Semantic Embedding
-        model = SentenceTransformer('all-MiniLM-L6-v2')  # Load the Sentence-BERT model
-        text_embedding = model.encode(summarized_text, convert_to_tensor=True)  # Generate embedding for the input text
-
-        # Generate embeddings for each article
-        article_embeddings = []
-        for article in articles:
-            content_to_embed = f"{article['title']} {article['description']} {article.get('content', '')}"  # Combine title, description, and content
-            embedding = model.encode(content_to_embed, convert_to_tensor=True)  # Generate embedding
-            article_embeddings.append(embedding)
-
-            # get the most similar articles
-        best_five_articles = compare_similarities(text_embedding, article_embeddings)
-
-        print("the most similar articles describing the content of your video are : ")
-
-        summarized_articles = []
-        for idx in best_five_articles:  # Display top 5 most similar articles
-            summary = summarizer(articles[idx]['content'], max_length=100, min_length=100, do_sample=False)
-            summarized_article = summary[0]['summary_text']
-
-            summarized_articles.append({
-                "title": articles[idx]['title'],
-                "summary": summarized_article,
-                "url": articles[idx]['url'],
-                "source": articles[idx]['source']
-            })
-
-            print(f"Title: {articles[idx]['title']}")
-            # print(f"Similarity Score: {similarities[idx]*100:.2f}%")
-            print(f"Summarized Text: {summarized_article}")
-            print(f"URL: {articles[idx]['url']}")
-            print(f"SOURCE: {articles[idx]['source']}")
-            print("=" * 80)
+        summarized_articles = result.value()
 
+    except JobCancelled:
+        raise
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Error: %s", e)
         return None  # Return an appropriate fallback value
 
-    return summarized_articles
\ No newline at end of file
+    return summarized_articles
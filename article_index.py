@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from instrumentation import count
+from news_client import normalize_query
+
+# Index settings can be set in the .env file
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_INDEX = os.getenv('TRUTHLENS_ARTICLE_INDEX', '0') == '1'
+# Above this many articles the optional hnswlib index is used instead of a brute-force scan
+ANN_THRESHOLD = 50000
+
+
+class ArticleIndex:
+    """
+    Persistent store of news articles and their sentence embeddings, shared by every request.
+
+    Article metadata lives in SQLite, one row per URL, so an article fetched again is never stored or
+    embedded twice. Row i of a memory-mapped float32 matrix holds the L2-normalised embedding of article i,
+    so a search is a single matrix-vector product over the mapped file (or an hnswlib query for very large
+    stores, if hnswlib is installed). The last fetch time of every query is recorded so callers can skip
+    the news API for queries fetched recently.
+
+    Safe to use from several threads, and from several processes sharing the directory.
+
+    Args:
+    - directory (str): Where articles.db and embeddings.f32 are stored.
+    - dim (int): Embedding size (384 for all-MiniLM-L6-v2).
+    - model (str): Name of the embedding model. An index built with another model is refused.
+    """
+
+    def __init__(self, directory, dim=384, model='all-MiniLM-L6-v2'):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dim = dim
+        self.model = model
+        self._matrix_path = os.path.join(directory, 'embeddings.f32')
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._capacity = 0
+        self._ann = None
+        self._ann_count = 0
+
+        self._db = sqlite3.connect(os.path.join(directory, 'articles.db'), check_same_thread=False,
+                                   isolation_level=None, timeout=30)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS articles (row INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL,
+                                                 data TEXT NOT NULL, added_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, fetched_at REAL NOT NULL);
+        """)
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('model', ?), ('dim', ?)", (model, str(dim)))
+        stored = dict(self._db.execute("SELECT key, value FROM meta"))
+        if stored['model'] != model or int(stored['dim']) != dim:
+            raise ValueError(f"Index in {directory} was built with {stored['model']} ({stored['dim']}-d), "
+                             f"not {model} ({dim}-d)")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def _map(self, rows):
+        """Make sure the memory map covers `rows` rows, growing the file if needed. Caller holds the lock."""
+        if rows <= self._capacity:
+            return
+        size = os.path.getsize(self._matrix_path) if os.path.exists(self._matrix_path) else 0
+        capacity = size // (4 * self.dim)
+        if capacity < rows:
+            # Grow geometrically so appends stay cheap
+            capacity = max(rows, 2 * capacity, 1024)
+            with open(self._matrix_path, 'ab') as f:
+                f.truncate(capacity * 4 * self.dim)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _known(self, keys):
+        """The keys among `keys` that are already stored. Caller holds the lock."""
+        if not keys:
+            return set()
+        placeholders = ",".join("?" * len(keys))
+        return {url for (url,) in self._db.execute(f"SELECT url FROM articles WHERE url IN ({placeholders})", keys)}
+
+    @staticmethod
+    def _key(article):
+        return (article.get('url') or article.get('title') or '').strip()
+
+    def add(self, articles, encoder, text=None):
+        """
+        Store the articles that are not in the index yet and embed only those.
+        :param articles: NewsAPI article dicts.
+        :param encoder: Function mapping a list of texts to L2-normalised embeddings of shape (N, dim).
+        :param text: Function giving the text to embed for an article (title by default).
+        :return: Number of articles added.
+        """
+        text = text or (lambda article: article.get('title') or '')
+        unique = {}
+        for article in articles:
+            key = self._key(article)
+            if key:
+                unique.setdefault(key, article)
+
+        with self._lock:
+            known = self._known(list(unique))
+        new = [(key, article) for key, article in unique.items() if key not in known]
+        count('article_index_duplicates', len(unique) - len(new))
+        if not new:
+            return 0
+        embeddings = np.asarray(encoder([text(article) for _, article in new]), dtype=np.float32)
+
+        with self._lock:
+            # IMMEDIATE takes the write lock now, so concurrent processes get distinct rows
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Another thread or process may have stored some of them while they were embedded
+                known = self._known([key for key, _ in new])
+                keep = [i for i, (key, _) in enumerate(new) if key not in known]
+                new, embeddings = [new[i] for i in keep], embeddings[keep]
+                start = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM articles").fetchone()[0]
+                self._map(start + len(new))
+                self._matrix[start:start + len(new)] = embeddings
+                self._matrix.flush()
+                now = time.time()
+                self._db.executemany("INSERT INTO articles VALUES (?, ?, ?, ?)", [
+                    (start + i, key, json.dumps(article), now) for i, (key, article) in enumerate(new)])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+        count('article_index_added', len(new))
+        logger.info("Added %d articles to the index (%d already stored)", len(new), len(unique) - len(new))
+        return len(new)
+
+    def mark_fetched(self, keywords):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?)", (normalize_query(keywords), time.time()))
+
+    def fetched_within(self, keywords, seconds):
+        """Whether the news API was queried for these keywords less than `seconds` ago."""
+        with self._lock:
+            row = self._db.execute("SELECT fetched_at FROM queries WHERE query = ?",
+                                   (normalize_query(keywords),)).fetchone()
+        return row is not None and time.time() - row[0] < seconds
+
+    def _ann_search(self, query, k, rows):
+        """Top-k rows with hnswlib, or None if hnswlib is not installed. Caller holds the lock."""
+        try:
+            import hnswlib
+        except ImportError:
+            return None
+        if self._ann is None:
+            self._ann = hnswlib.Index(space='ip', dim=self.dim)
+            self._ann.init_index(max_elements=max(rows, 1024), ef_construction=200, M=16)
+            self._ann_count = 0
+        if rows > self._ann_count:
+            if rows > self._ann.get_max_elements():
+                self._ann.resize_index(max(rows, 2 * self._ann.get_max_elements()))
+            self._ann.add_items(self._matrix[self._ann_count:rows], np.arange(self._ann_count, rows))
+            self._ann_count = rows
+        self._ann.set_ef(max(50, 2 * k))
+        labels, distances = self._ann.knn_query(query, k=k)
+        # Inner-product space returns 1 - similarity
+        return labels[0], 1 - distances[0]
+
+    def search(self, query_embedding, top_k=50):
+        """
+        Find the stored articles most similar to an L2-normalised query embedding.
+        :return: (articles, embeddings, similarities), most similar first.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            rows = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM articles").fetchone()[0]
+            k = min(top_k, rows)
+            if k == 0:
+                return [], np.empty((0, self.dim), dtype=np.float32), np.empty(0, dtype=np.float32)
+            self._map(rows)
+
+            result = self._ann_search(query, k, rows) if rows >= ANN_THRESHOLD else None
+            if result is None:
+                similarities = np.asarray(self._matrix[:rows] @ query)
+                top = np.argpartition(-similarities, k - 1)[:k]
+                top = top[np.argsort(-similarities[top])]
+                result = top, similarities[top]
+            top, scores = result
+            embeddings = np.array(self._matrix[top])
+            data = dict(self._db.execute(
+                f"SELECT row, data FROM articles WHERE row IN ({','.join('?' * len(top))})",
+                [int(row) for row in top]))
+
+        articles = [json.loads(data[int(row)]) for row in top]
+        return articles, embeddings, np.asarray(scores, dtype=np.float32)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+            self._matrix = None
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+def default_article_index(model='all-MiniLM-L6-v2', dim=384):
+    """
+    Return the application-wide article index of `model` embeddings if TRUTHLENS_ARTICLE_INDEX=1, stored in
+    TRUTHLENS_ARTICLE_INDEX_DIR (~/.cache/truthlens/articles by default), otherwise None.
+    """
+    global _default_index
+    if not ARTICLE_INDEX:
+        return None
+    with _default_index_lock:
+        if _default_index is None:
+            directory = os.getenv('TRUTHLENS_ARTICLE_INDEX_DIR') or os.path.join(
+                os.path.expanduser('~'), '.cache', 'truthlens', 'articles')
+            _default_index = ArticleIndex(directory, dim, model)
+        return _default_index
@@ -0,0 +1,324 @@
+"""
+Headless batch scan of many videos with the deepfake and fake news pipelines.
+
+Videos are spread over a pool of worker processes that each load the models once. Results are
+appended to a JSONL or CSV file as soon as each video is done, with per-stage timings and counters, and a rerun
+with the same output file skips the videos already recorded in it.
+
+Usage:
+    python batch_scan.py videos/ --output results.jsonl --workers 4
+    python batch_scan.py "uploads/**/*.mp4" --output results.csv --pipelines deepfake
+    python batch_scan.py manifest.txt --output results.jsonl
+    python batch_scan.py long_videos/ --output timelines.jsonl --pipelines timeline
+"""
+import argparse
+import csv
+import glob
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".flv")
+MANIFEST_EXTENSIONS = (".txt", ".csv", ".jsonl")
+CSV_FIELDS = ["path", "status", "verdict", "fake_probability", "articles", "timeline", "timings", "counters",
+              "total_seconds", "error"]
+
+logger = logging.getLogger(__name__)
+
+
+def read_manifest(path):
+    """Video paths from a .txt (one per line), .csv ("path" column or first column) or .jsonl ("path" key) file."""
+    base = os.path.dirname(os.path.abspath(path))
+    paths = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.reader(f))
+            if rows and "path" in rows[0]:
+                column = rows[0].index("path")
+                rows = rows[1:]
+            else:
+                column = 0
+            paths = [row[column] for row in rows if row]
+        elif path.endswith(".jsonl"):
+            paths = [json.loads(line)["path"] for line in f if line.strip()]
+        else:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    # Relative paths are relative to the manifest
+    return [os.path.join(base, p) for p in paths]
+
+
+def collect_videos(inputs):
+    """Expand directories, glob patterns and manifest files into a de-duplicated list of video paths."""
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                videos.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(item) and item.lower().endswith(MANIFEST_EXTENSIONS):
+            videos.extend(read_manifest(item))
+        elif os.path.isfile(item):
+            videos.append(item)
+        else:
+            videos.extend(sorted(path for path in glob.glob(item, recursive=True) if path.lower().endswith(VIDEO_EXTENSIONS)))
+
+    seen = set()
+    unique = []
+    for video in videos:
+        video = os.path.abspath(video)
+        if video not in seen:
+            seen.add(video)
+            unique.append(video)
+    return unique
+
+
+def complete_length(output_path):
+    """
+    Size of the output file up to the end of its last complete record: its last newline, outside quotes
+    for a CSV file since quoted fields can hold newlines. A record cut short by an interrupted run lies beyond.
+    """
+    with open(output_path, "rb") as f:
+        data = f.read()
+    if not output_path.endswith(".csv"):
+        return data.rfind(b"\n") + 1
+    end = offset = quotes = 0
+    for line in data.split(b"\n")[:-1]:
+        offset += len(line) + 1
+        # Escaped quotes are doubled, so a newline is outside quotes when the count so far is even
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            end = offset
+    return end
+
+
+def _jsonl_rows(lines, output_path):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning("Skipping unreadable record on line %d of %s, its video is scanned again",
+                           number, output_path)
+
+
+def _csv_rows(lines, output_path):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # A row cut short lacks its last fields
+        if row.get(CSV_FIELDS[-1]) is None:
+            logger.warning("Skipping unreadable record on line %d of %s, its video is scanned again",
+                           reader.line_num, output_path)
+            continue
+        yield row
+
+
+def read_recorded(output_path, retry_errors=False):
+    """
+    Paths already recorded in the output file, so an interrupted run can resume.
+    A record cut short by the interruption is ignored, so its video is scanned again.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    length = complete_length(output_path)
+    with open(output_path, "rb") as f:
+        text = f.read(length).decode("utf-8")
+    if length < os.path.getsize(output_path):
+        logger.warning("Ignoring the partial record at the end of %s, its video is scanned again", output_path)
+
+    recorded = set()
+    lines = io.StringIO(text, newline="")
+    rows = _csv_rows(lines, output_path) if output_path.endswith(".csv") else _jsonl_rows(lines, output_path)
+    for row in rows:
+        if retry_errors and row.get("status") != "ok":
+            continue
+        recorded.add(row["path"])
+    return recorded
+
+
+class StageTimer:
+    """Progress callback for JobControl that turns stage start times into per-stage durations."""
+
+    def __init__(self, prefix, timings):
+        self.prefix = prefix
+        self.timings = timings
+        self._current = None
+        self._start = None
+
+    def __call__(self, stage, message):
+        self.stop()
+        self._current = f"{self.prefix}.{stage}" + (".cached" if message == "cached" else "")
+        self._start = time.perf_counter()
+
+    def stop(self):
+        if self._current is not None:
+            self.timings[self._current] = round(time.perf_counter() - self._start, 3)
+            self._current = None
+
+
+def _init_worker(pipelines, warm_up):
+    # Keep TensorFlow quiet in the workers
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    # Pipeline messages stay out of the way of the progress lines, only warnings are shown
+    logging.basicConfig(level=logging.WARNING, format="%(processName)s %(name)s: %(message)s")
+    # Only the modules of the selected pipelines are imported, so only their models are registered
+    if "deepfake" in pipelines or "timeline" in pipelines:
+        import DEEPFAKE
+    if "news" in pipelines:
+        import FAKENEWS
+    if warm_up:
+        from model_registry import registry
+        registry.warm_up()
+
+
+class CounterSink:
+    """Instrumentation sink summing the counters (frames decoded, faces found, cache hits, ...) of one video."""
+
+    def __init__(self, counters):
+        self.counters = counters
+
+    def __call__(self, event):
+        if event["kind"] == "counter":
+            name = event["name"]
+            if event["attrs"].get("stage"):
+                name += "." + event["attrs"]["stage"]
+            self.counters[name] = self.counters.get(name, 0) + event["value"]
+
+
+def analyze_video(path, pipelines, use_cache):
+    """Run the selected pipelines on one video in a worker process and return its result record."""
+    from instrumentation import instrumentation
+    from pipeline_control import JobControl
+    from result_cache import default_cache
+
+    cache = default_cache() if use_cache else None
+    record = {"path": path, "status": "ok", "verdict": None, "fake_probability": None, "articles": None,
+              "timeline": None, "timings": {}, "counters": {}, "error": None}
+    start = time.perf_counter()
+    # Each worker analyzes one video at a time, so every counter event belongs to this one
+    sink = instrumentation.add_sink(CounterSink(record["counters"]))
+
+    try:
+        if "deepfake" in pipelines:
+            from DEEPFAKE import prediction
+            timer = StageTimer("deepfake", record["timings"])
+            predictions = prediction(path, cache=cache, control=JobControl(progress=timer))
+            timer.stop()
+            probability = float(predictions.ravel()[0])
+            record["fake_probability"] = round(probability, 6)
+            record["verdict"] = "FAKE" if probability > 0.5 else "REAL"
+
+        if "timeline" in pipelines:
+            from DEEPFAKE import timeline_prediction
+            timer = StageTimer("timeline", record["timings"])
+            segments, predictions = timeline_prediction(path, cache=cache, control=JobControl(progress=timer))
+            timer.stop()
+            # [start seconds, end seconds, fake probability] per segment
+            record["timeline"] = [[round(start, 2), round(end, 2), round(probability, 6)]
+                                  for start, end, probability in segments.tolist()]
+            if "deepfake" not in pipelines:
+                probability = float(predictions.ravel()[0])
+                record["fake_probability"] = round(probability, 6)
+                record["verdict"] = "FAKE" if probability > 0.5 else "REAL"
+
+        if "news" in pipelines:
+            from FAKENEWS import fake_news_detection
+            timer = StageTimer("news", record["timings"])
+            articles = fake_news_detection(path, cache=cache, control=JobControl(progress=timer))
+            timer.stop()
+            record["articles"] = [
+                {"title": article["title"], "url": article["url"], "similarity": article.get("similarity")}
+                for article in articles
+            ] if articles else []
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    finally:
+        instrumentation.remove_sink(sink)
+
+    record["total_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+class ResultWriter:
+    """Appends result records to a JSONL or CSV file, flushing after each one."""
+
+    def __init__(self, output_path):
+        self.csv = output_path.endswith(".csv")
+        if os.path.exists(output_path):
+            length = complete_length(output_path)
+            if length < os.path.getsize(output_path):
+                # Drop the partial record of an interrupted run, so the next one is not appended to it
+                os.truncate(output_path, length)
+        new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self.file = open(output_path, "a", encoding="utf-8", newline="")
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            if new_file:
+                self.writer.writeheader()
+
+    def write(self, record):
+        if self.csv:
+            row = dict(record, articles=json.dumps(record["articles"]), timeline=json.dumps(record["timeline"]),
+                       timings=json.dumps(record["timings"]), counters=json.dumps(record["counters"]))
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="Video files, directories, glob patterns or manifest files")
+    parser.add_argument("--output", "-o", required=True, help="Results file (.jsonl or .csv)")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--pipelines", nargs="+", choices=["deepfake", "timeline", "news"],
+                        default=["deepfake", "news"],
+                        help="Pipelines to run on each video (timeline: deepfake scores of every segment)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the on-disk result cache")
+    parser.add_argument("--no-warm-up", action="store_true", help="Load models on first use instead of at worker start")
+    parser.add_argument("--retry-errors", action="store_true", help="Run again the videos recorded with an error")
+    args = parser.parse_args(argv)
+
+    videos = collect_videos(args.inputs)
+    recorded = read_recorded(args.output, args.retry_errors)
+    todo = [video for video in videos if video not in recorded]
+    print(f"{len(videos)} videos found, {len(videos) - len(todo)} already in {args.output}, {len(todo)} to scan")
+    if not todo:
+        return 0
+
+    writer = ResultWriter(args.output)
+    failures = 0
+    # spawn: workers start clean instead of inheriting a forked TensorFlow runtime
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(args.pipelines, not args.no_warm_up)) as pool:
+        futures = [pool.submit(analyze_video, video, args.pipelines, not args.no_cache) for video in todo]
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                record = future.result()
+                writer.write(record)
+                failures += record["status"] != "ok"
+                summary = record["verdict"] or record["status"]
+                print(f"[{done}/{len(todo)}] {record['path']}: {summary} in {record['total_seconds']:.1f}s")
+        except KeyboardInterrupt:
+            print("Interrupted, rerun the same command to resume")
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            writer.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
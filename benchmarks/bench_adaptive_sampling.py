@@ -0,0 +1,74 @@
+"""
+Compare the deepfake sampling modes on one video: fixed-interval sampling (every 15th frame of the whole
+video), adaptive sampling (at most 108 frames spread over the duration) and adaptive sampling with the
+confidence-based early exit. Reports frames processed, wall time and the resulting fake probability.
+
+Usage:
+    python benchmarks/bench_adaptive_sampling.py --video fake_test_video.mp4
+    python benchmarks/bench_adaptive_sampling.py --video long_clip.mp4 --min-confidence 0.6
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+from common import REPO, run_from_repository
+
+run_from_repository()
+
+import numpy as np
+
+import DEEPFAKE
+from model_registry import registry
+from pipeline_control import JobControl
+
+
+def run_mode(video_path, mode):
+    """Sample faces with `mode` and classify them. Returns (frames processed, probability)."""
+    total_frames, fps = DEEPFAKE.video_properties(video_path)
+    max_frames = DEEPFAKE.MAX_SEQUENCE_LENGTH if mode == "adaptive" else None
+    positions = DEEPFAKE.plan_sample_positions(total_frames, fps, DEEPFAKE.FRAME_INTERVAL, max_frames=max_frames)
+    processed = sum(1 for _ in positions)
+
+    faces = DEEPFAKE.sample_faces(video_path, JobControl(), mode)
+    predictions = DEEPFAKE.classify_features(DEEPFAKE.feature_extraction(faces))
+    return processed, float(np.asarray(predictions).ravel()[0])
+
+
+def run_early_exit(video_path, min_confidence, tolerance):
+    _, _, predictions, processed = DEEPFAKE.sample_faces_with_early_exit(
+        video_path, min_confidence=min_confidence, tolerance=tolerance)
+    return processed, float(np.asarray(predictions).ravel()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=str(REPO / "fake_test_video.mp4"), help="Video to analyze")
+    parser.add_argument("--min-confidence", type=float, default=DEEPFAKE.EARLY_EXIT_MIN_CONFIDENCE,
+                        help="Confidence the early exit requires")
+    parser.add_argument("--tolerance", type=float, default=DEEPFAKE.EARLY_EXIT_TOLERANCE,
+                        help="Largest change between two verdicts the early exit accepts")
+    args = parser.parse_args()
+
+    # Load every model before timing anything
+    registry.warm_up(['mtcnn', 'resnet50_features', 'deepfake_classifier'])
+
+    runs = [
+        ("interval", lambda: run_mode(args.video, "interval")),
+        ("adaptive", lambda: run_mode(args.video, "adaptive")),
+        ("early exit", lambda: run_early_exit(args.video, args.min_confidence, args.tolerance)),
+    ]
+    baseline = None
+    print(f"{'Mode':<12} {'Frames':>7} {'Saved':>7} {'Seconds':>8} {'P(fake)':>8}")
+    for name, run in runs:
+        start = time.perf_counter()
+        processed, probability = run()
+        seconds = time.perf_counter() - start
+        baseline = baseline or processed
+        saved = 100 * (1 - processed / baseline) if baseline else 0
+        print(f"{name:<12} {processed:>7} {saved:>6.0f}% {seconds:>8.2f} {probability:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
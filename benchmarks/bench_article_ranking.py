@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of the article ranking stage at 50, 500 and 5,000 candidate articles:
+the old per-article util.cos_sim loop + full sort against rank_articles() (one matrix product + argpartition).
+With --encode, also compares one model.encode() call per article against one batched call.
+
+Usage:
+    python benchmarks/bench_article_ranking.py
+    python benchmarks/bench_article_ranking.py --encode --sizes 50 500
+"""
+import argparse
+
+from common import time_it
+
+import numpy as np
+import torch
+from sentence_transformers import util
+
+import FAKENEWS
+from model_registry import registry
+
+
+def loop_ranking(text_embedding, article_embeddings):
+    """The original compare_similarities: one cos_sim call per article, then a full sort."""
+    similarities = [util.cos_sim(text_embedding, embedding).item() for embedding in article_embeddings]
+    return sorted(range(len(similarities)), key=lambda i: similarities[i], reverse=True)[:5]
+
+
+def random_embeddings(count, dim=384, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((count, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def synthetic_articles(count):
+    words = "election minister vaccine climate market storm court police football energy".split()
+    rng = np.random.default_rng(1)
+    return [{
+        "title": " ".join(rng.choice(words, 8)),
+        "description": " ".join(rng.choice(words, 25)),
+        "content": " ".join(rng.choice(words, 150)),
+    } for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000], help="Numbers of candidate articles")
+    parser.add_argument("--encode", action="store_true", help="Also benchmark per-article vs batched encoding")
+    args = parser.parse_args()
+
+    print(f"{'articles':>8}  {'loop rank':>10}  {'matmul rank':>11}  {'speed-up':>8}")
+    for size in args.sizes:
+        embeddings = random_embeddings(size + 1)
+        query, candidates = embeddings[0], embeddings[1:]
+        tensors = [torch.from_numpy(row) for row in candidates]
+
+        loop_time, loop_top = time_it(lambda: loop_ranking(torch.from_numpy(query), tensors))
+        fast_time, (fast_top, _) = time_it(lambda: FAKENEWS.rank_articles(query, candidates))
+        assert loop_top == fast_top.tolist(), "rankings differ"
+
+        print(f"{size:>8}  {loop_time * 1000:>8.2f}ms  {fast_time * 1000:>9.3f}ms  {loop_time / fast_time:>7.0f}x")
+
+    if args.encode:
+        registry.warm_up(['sentence_model'])
+        model = registry.get('sentence_model')
+        print(f"\n{'articles':>8}  {'per-article':>11}  {'batched':>9}  {'speed-up':>8}")
+        for size in args.sizes:
+            articles = synthetic_articles(size)
+            per_article_time, _ = time_it(
+                lambda: [model.encode(FAKENEWS.article_text(article)) for article in articles], repeat=1)
+            batched_time, _ = time_it(lambda: FAKENEWS.embed_articles(articles), repeat=1)
+            print(f"{size:>8}  {per_article_time:>10.2f}s  {batched_time:>8.2f}s  {per_article_time / batched_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compare the old audio path of preprocess_video (moviepy decodes the video, re-encodes the audio to MP3,
+Whisper decodes the MP3 again) with the in-memory path (ffmpeg decodes the audio track straight to PCM).
+Reports the time saved per minute of audio.
+
+Usage:
+    python benchmarks/bench_audio_extraction.py fake_test_video.mp4
+    python benchmarks/bench_audio_extraction.py clip.mp4 --transcribe
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import time_it
+
+import whisper
+from moviepy.video.io.VideoFileClip import VideoFileClip
+
+import FAKENEWS
+from model_registry import registry
+
+
+def mp3_audio(video_path):
+    """The original path: moviepy -> MP3 file -> Whisper decodes the MP3."""
+    with tempfile.TemporaryDirectory() as directory:
+        audio_path = os.path.join(directory, "output_audio.mp3")
+        with VideoFileClip(video_path) as video_clip:
+            video_clip.audio.write_audiofile(audio_path, logger=None)
+        return whisper.load_audio(audio_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="Video file to extract audio from")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path, the best one is reported")
+    parser.add_argument("--transcribe", action="store_true", help="Also time Whisper on both audio buffers")
+    args = parser.parse_args()
+
+    mp3_time, mp3_pcm = time_it(lambda: mp3_audio(args.video), args.repeat)
+    pcm_time, pcm = time_it(lambda: FAKENEWS.load_audio(args.video), args.repeat)
+
+    minutes = len(pcm) / FAKENEWS.SAMPLE_RATE / 60
+    print(f"Audio length:          {minutes * 60:.1f}s")
+    print(f"moviepy + MP3 + decode: {mp3_time:.2f}s")
+    print(f"In-memory PCM:          {pcm_time:.2f}s")
+    print(f"Saved per audio minute: {(mp3_time - pcm_time) / minutes:.2f}s")
+
+    if args.transcribe:
+        registry.warm_up(['whisper_base'])
+        model = registry.get('whisper_base')
+        for name, audio in (("MP3", mp3_pcm), ("PCM", pcm)):
+            start = time.perf_counter()
+            text = model.transcribe(audio)["text"]
+            print(f"Whisper on {name} audio:  {time.perf_counter() - start:.2f}s  {text[:60]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Measure detect-then-track face localisation against MTCNN on every sampled frame.
+
+Reports the MTCNN calls saved and the wall time of both paths, how closely the tracked boxes follow the
+detected ones (IoU per frame), and the accuracy impact downstream: the LSTM fake probability computed
+from the crops of each path.
+
+Usage:
+    python benchmarks/bench_face_tracking.py
+    python benchmarks/bench_face_tracking.py --video clip.mp4 --keyframe-interval 8
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+from common import REPO, run_from_repository
+
+run_from_repository()
+
+import numpy as np
+
+import DEEPFAKE
+from model_registry import registry
+
+
+def iou(a, b):
+    if a is None or b is None:
+        return float(a is None and b is None)
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    width = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    height = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = width * height
+    return intersection / (aw * ah + bw * bh - intersection)
+
+
+def crops(frames, boxes):
+    faces = []
+    for frame, box in zip(frames, boxes):
+        if box is not None:
+            x, y, w, h = box
+            faces.append(frame[y:y+h, x:x+w])
+    return faces
+
+
+def probability(faces):
+    predictions = DEEPFAKE.classify_features(DEEPFAKE.feature_extraction(faces))
+    return float(np.asarray(predictions).ravel()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=str(REPO / "fake_test_video.mp4"), help="Video to analyze")
+    parser.add_argument("--keyframe-interval", type=int, default=4, help="Frames per MTCNN call when tracking")
+    parser.add_argument("--min-score", type=float, default=0.6, help="Lowest template match score accepted")
+    args = parser.parse_args()
+
+    frames = [frame for _, frame in DEEPFAKE.iter_video_frames(args.video, DEEPFAKE.FRAME_INTERVAL)]
+    registry.warm_up(['mtcnn', 'resnet50_features', 'deepfake_classifier'])
+    DEEPFAKE.detect_best_face(frames[0])  # build the MTCNN graphs before timing
+
+    start = time.perf_counter()
+    detected = [DEEPFAKE.detect_best_face(frame) for frame in frames]
+    detect_seconds = time.perf_counter() - start
+
+    tracker = DEEPFAKE.FaceTracker(args.keyframe_interval, min_score=args.min_score)
+    start = time.perf_counter()
+    tracked = [tracker.update(frame) for frame in frames]
+    track_seconds = time.perf_counter() - start
+
+    overlaps = np.array([iou(a, b) for a, b in zip(detected, tracked)])
+    detected_probability = probability(crops(frames, detected))
+    tracked_probability = probability(crops(frames, tracked))
+
+    print(f"Frames:               {len(frames)}")
+    print(f"MTCNN calls:          {len(frames)} -> {tracker.detections} "
+          f"({100 * (1 - tracker.detections / len(frames)):.0f}% saved, {tracker.tracked} tracked)")
+    print(f"Localisation time:    {detect_seconds:.2f}s -> {track_seconds:.2f}s "
+          f"({detect_seconds / track_seconds:.2f}x)")
+    print(f"Box IoU vs MTCNN:     mean {overlaps.mean():.3f}, min {overlaps.min():.3f}, "
+          f">= 0.5 on {100 * np.mean(overlaps >= 0.5):.0f}% of frames")
+    print(f"Faces found:          {sum(box is not None for box in detected)} -> "
+          f"{sum(box is not None for box in tracked)}")
+    print(f"P(fake):              {detected_probability:.4f} -> {tracked_probability:.4f} "
+          f"(verdict {'unchanged' if (detected_probability > 0.5) == (tracked_probability > 0.5) else 'CHANGED'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare ResNet50 feature extraction throughput (faces/sec) on CPU:
+the old path (one preprocess_image + predict() call per face) against the batched feature_extraction().
+
+Usage:
+    python benchmarks/bench_feature_extraction.py --faces 100 --batch-size 32
+    python benchmarks/bench_feature_extraction.py --video fake_test_video.mp4
+"""
+import argparse
+import os
+import sys
+
+# CPU only, and keep TensorFlow quiet
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+from common import time_it
+
+import numpy as np
+
+import DEEPFAKE
+from model_registry import registry
+
+
+def synthetic_faces(count, seed=0):
+    """Random BGR crops with the range of sizes MTCNN typically returns."""
+    rng = np.random.default_rng(seed)
+    faces = []
+    for _ in range(count):
+        height, width = rng.integers(80, 320, size=2)
+        faces.append(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8))
+    return faces
+
+
+def video_faces(video_path, count):
+    frames = (frame for _, frame in DEEPFAKE.iter_video_frames(video_path))
+    faces = DEEPFAKE.extract_highest_confidence_face_from_frames(frames)
+    # Repeat the real crops to reach the requested number of faces
+    return [faces[i % len(faces)] for i in range(count)] if faces else []
+
+
+def per_face_features(faces):
+    """The original implementation: one predict() call per face."""
+    feature_extractor = registry.get('resnet50_features')
+    features = [feature_extractor.predict(DEEPFAKE.preprocess_image(face), verbose=0) for face in faces]
+    return np.expand_dims(np.concatenate(features, axis=0), axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, default=100, help="Number of face crops to process")
+    parser.add_argument("--batch-size", type=int, default=32, help="Batch size of the batched path")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path, the best one is reported")
+    parser.add_argument("--video", help="Take face crops from this video instead of random crops")
+    args = parser.parse_args()
+
+    faces = video_faces(args.video, args.faces) if args.video else synthetic_faces(args.faces)
+    if not faces:
+        sys.exit("No faces to benchmark")
+
+    # Load the model (and build the graph) before timing anything
+    registry.warm_up(['resnet50_features'])
+    DEEPFAKE.feature_extraction(faces[:1])
+
+    per_face_time, per_face_result = time_it(lambda: per_face_features(faces), args.repeat)
+    batched_time, batched_result = time_it(
+        lambda: DEEPFAKE.feature_extraction(faces, batch_size=args.batch_size), args.repeat)
+
+    max_diff = float(np.max(np.abs(per_face_result - batched_result)))
+
+    print(f"Faces:            {len(faces)}")
+    print(f"Per-face predict: {per_face_time:.2f}s  ({len(faces) / per_face_time:.1f} faces/sec)")
+    print(f"Batched (bs={args.batch_size}):  {batched_time:.2f}s  ({len(faces) / batched_time:.1f} faces/sec)")
+    print(f"Speed-up:         {per_face_time / batched_time:.2f}x")
+    print(f"Max feature diff: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Compare the single-pass media ingest with the double decode it replaces.
+
+Both modes hand the sampled frames (every FRAME_INTERVAL-th) to one consumer thread and the 16 kHz audio
+to another, as the two pipelines of a job do:
+- double: OpenCV decodes the frames (DEEPFAKE.iter_video_frames) while ffmpeg decodes the audio
+  (the FAKENEWS.load_audio command), each reading the whole file;
+- single: media_ingest.MediaIngest demuxes the file once with PyAV and feeds both consumers, the audio
+  in 30 s chunks as FAKENEWS.preprocess_video transcribes it;
+- single-whole: the same demux, with the audio consumer waiting for the whole track (`read_audio`), as
+  the default, non-streaming transcription would.
+
+Reports the wall time (best of --repeat) and the bytes read from the file. Bytes read in this process
+come from /proc/self/io (Linux only), those of the ffmpeg subprocess from its own statistics. With
+--frame-delay each frame takes that long to consume, to see how a slow face detector paces the demux, and
+with --audio-delay each second of audio takes that long to consume, standing in for Whisper.
+
+Usage:
+    python benchmarks/bench_media_ingest.py
+    python benchmarks/bench_media_ingest.py --video clip.mp4 --repeat 5 --frame-delay 0.05 --audio-delay 0.1
+"""
+import argparse
+import os
+import re
+import subprocess
+import threading
+import time
+
+from common import REPO
+
+import numpy as np
+
+import DEEPFAKE
+from FAKENEWS import SAMPLE_RATE, _ffmpeg_executable
+from media_ingest import MediaIngest
+
+
+def bytes_read_by_process():
+    """Bytes this process has read through read() calls so far, or None outside Linux."""
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            return int(re.search(r"^rchar: (\d+)", f.read(), re.M).group(1))
+    except OSError:
+        return None
+
+
+def ffmpeg_audio(video_path):
+    """
+    Decode the audio like FAKENEWS.load_audio.
+    Returns (samples, bytes ffmpeg read from the file, bytes of PCM it wrote to the pipe).
+    """
+    command = [
+        _ffmpeg_executable(), "-nostdin", "-loglevel", "verbose", "-threads", "0", "-i", video_path,
+        "-vn", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    result = subprocess.run(command, capture_output=True, check=True)
+    statistics = re.findall(rb"Statistics: (\d+) bytes read", result.stderr)
+    pcm = np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+    return pcm, int(statistics[-1]) if statistics else None, len(result.stdout)
+
+
+def run_concurrently(consume_frames, consume_audio):
+    results = {}
+
+    def run(name, function):
+        results[name] = function()
+
+    threads = [threading.Thread(target=run, args=("frames", consume_frames)),
+               threading.Thread(target=run, args=("audio", consume_audio))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results["frames"], results["audio"]
+
+
+def consume(frames, delay):
+    kept = 0
+    for _ in frames:
+        kept += 1
+        if delay:
+            time.sleep(delay)
+    return kept
+
+
+def consume_audio(chunks, delay):
+    """Take `delay` seconds per second of audio, chunk by chunk. Returns the number of samples."""
+    samples = 0
+    for chunk in chunks:
+        samples += len(chunk)
+        if delay:
+            time.sleep(delay * len(chunk) / SAMPLE_RATE)
+    return samples
+
+
+def double_decode(video_path, delay, audio_delay):
+    """Returns (seconds, frames, audio samples, bytes read)."""
+    before = bytes_read_by_process()
+    decoded = {}
+
+    def audio():
+        pcm, decoded["ffmpeg_bytes"], decoded["pipe_bytes"] = ffmpeg_audio(video_path)
+        return consume_audio([pcm], audio_delay)
+
+    seconds, frames, samples = run_concurrently(
+        lambda: consume(DEEPFAKE.iter_video_frames(video_path, DEEPFAKE.FRAME_INTERVAL), delay), audio)
+    ffmpeg_bytes, pipe_bytes = decoded["ffmpeg_bytes"], decoded["pipe_bytes"]
+    after = bytes_read_by_process()
+    total = None
+    if before is not None and ffmpeg_bytes is not None:
+        # The PCM read back from the pipe is not file input
+        total = after - before - pipe_bytes + ffmpeg_bytes
+    return seconds, frames, samples, total
+
+
+def single_pass(video_path, delay, audio_delay, whole_track=False):
+    """Returns (seconds, frames, audio samples, bytes read)."""
+    before = bytes_read_by_process()
+    media = MediaIngest(video_path)
+
+    def frames():
+        total_frames, fps = media.properties()
+        positions = DEEPFAKE.plan_sample_positions(total_frames, fps, DEEPFAKE.FRAME_INTERVAL)
+        return consume(media.frames(positions), delay)
+
+    def audio():
+        if whole_track:
+            return consume_audio([media.read_audio()], audio_delay)
+        return consume_audio(media.iter_audio(chunk_seconds=30), audio_delay)
+
+    seconds, frames, samples = run_concurrently(frames, audio)
+    media.close()
+    after = bytes_read_by_process()
+    return seconds, frames, samples, None if before is None else after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=str(REPO / "fake_test_video.mp4"), help="Video to ingest")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode, the fastest one is reported")
+    parser.add_argument("--frame-delay", type=float, default=0.0, help="Seconds spent on each sampled frame")
+    parser.add_argument("--audio-delay", type=float, default=0.0, help="Seconds spent on each second of audio")
+    args = parser.parse_args()
+
+    size = os.path.getsize(args.video)
+    print(f"{args.video}: {size / 2**20:.1f} MB")
+    print(f"{'Mode':<12} {'Wall time':>10} {'Frames':>7} {'Audio':>9} {'Bytes read':>12} {'x file size':>12}")
+    modes = (("double", double_decode), ("single", single_pass),
+             ("single-whole", lambda *delays: single_pass(*delays, whole_track=True)))
+    for name, function in modes:
+        runs = [function(args.video, args.frame_delay, args.audio_delay) for _ in range(args.repeat)]
+        seconds, frames, samples, total = min(runs, key=lambda run: run[0])
+        read_text = "n/a" if total is None else f"{total / 2**20:.1f} MB"
+        ratio_text = "n/a" if total is None else f"{total / size:.2f}"
+        print(f"{name:<12} {seconds:>9.2f}s {frames:>7} {samples / SAMPLE_RATE:>8.1f}s "
+              f"{read_text:>12} {ratio_text:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Check that the memory-bounded deepfake pipeline keeps peak memory flat as videos get longer.
+
+Synthetic clips of increasing duration (the test video looped with ffmpeg) are each analyzed by
+`prediction` in a fresh process, with and without TRUTHLENS_MEMORY_BOUNDED. The peak RSS of every run is
+reported, and the script fails (exit code 1) if the bounded runs grow by more than --max-growth-mb
+between the shortest and the longest clip. Model memory is the same in every run, so only growth counts.
+
+Usage:
+    python benchmarks/bench_memory_bound.py
+    python benchmarks/bench_memory_bound.py --durations 30 120 600 --dtype float16 --max-growth-mb 64
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter so each peak RSS belongs to one video
+CHILD = """
+import resource, sys
+import DEEPFAKE
+probability = float(DEEPFAKE.prediction(sys.argv[1]).ravel()[0])
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(probability, peak if sys.platform == "darwin" else peak * 1024)
+"""
+
+
+def make_clip(seconds, directory):
+    sys.path.insert(0, str(REPO))
+    from FAKENEWS import _ffmpeg_executable
+
+    path = os.path.join(directory, f"clip_{seconds}s.mp4")
+    subprocess.run([_ffmpeg_executable(), "-y", "-loglevel", "error", "-stream_loop", "-1",
+                    "-i", str(REPO / "fake_test_video.mp4"), "-t", str(seconds), "-an", "-c:v", "libx264",
+                    "-preset", "veryfast", path], check=True)
+    return path
+
+
+def peak_rss(video_path, bounded, dtype):
+    """Return (fake probability, peak RSS in bytes) of one prediction in a fresh process."""
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="2", TRUTHLENS_CACHE="0", CUDA_VISIBLE_DEVICES="-1",
+               TRUTHLENS_MEMORY_BOUNDED="1" if bounded else "0", TRUTHLENS_FEATURE_DTYPE=dtype)
+    result = subprocess.run([sys.executable, "-c", CHILD, video_path], cwd=REPO, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    probability, peak = result.stdout.strip().splitlines()[-1].split()
+    return float(probability), int(peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 120, 480], help="Clip lengths in seconds")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32", help="Feature buffer dtype")
+    parser.add_argument("--max-growth-mb", type=float, default=64, help="Allowed peak growth of the bounded runs")
+    parser.add_argument("--skip-unbounded", action="store_true", help="Only run the memory-bounded mode")
+    args = parser.parse_args()
+
+    bounded_peaks = []
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'Clip':>7} {'Unbounded':>12} {'Bounded':>12} {'P(fake)':>16}")
+        for seconds in sorted(args.durations):
+            clip = make_clip(seconds, directory)
+            unbounded = (None, None) if args.skip_unbounded else peak_rss(clip, False, "float32")
+            bounded = peak_rss(clip, True, args.dtype)
+            bounded_peaks.append(bounded[1])
+            unbounded_text = "-" if unbounded[1] is None else f"{unbounded[1] / 2**20:.0f} MB"
+            probabilities = f"{bounded[0]:.4f}" if unbounded[0] is None else f"{unbounded[0]:.4f}/{bounded[0]:.4f}"
+            print(f"{seconds:>6}s {unbounded_text:>12} {bounded[1] / 2**20:>9.0f} MB {probabilities:>16}")
+
+    growth = (bounded_peaks[-1] - bounded_peaks[0]) / 2**20
+    print(f"Bounded peak growth from {min(args.durations)}s to {max(args.durations)}s: {growth:.1f} MB "
+          f"(limit {args.max_growth_mb:.0f} MB)")
+    if growth > args.max_growth_mb:
+        print("Memory bound FAILED")
+        return 1
+    print("Memory bound holds")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
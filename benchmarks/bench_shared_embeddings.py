@@ -0,0 +1,113 @@
+"""
+Measure what sharing one sentence embedding model between KeyBERT and article ranking saves.
+
+Each mode runs in a fresh process:
+- separate: `KeyBERT()` with its own encoder next to `SentenceTransformer(model)`, as the pipeline used to;
+- shared: the registry models of FAKENEWS.py, where KeyBERT wraps the resident sentence model and the
+  transcript and its candidate keywords are embedded in one batched call.
+
+Both extract the keywords of a transcript, embed the fixture articles and the transcript summary. Reported
+per mode: model load time, peak RSS after loading and after the run, and the latency of the keyword and
+embedding work (best of --repeat), plus whether both modes find the same keywords.
+
+Usage:
+    python benchmarks/bench_shared_embeddings.py
+    python benchmarks/bench_shared_embeddings.py --transcript transcript.txt --repeat 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+FIXTURE = REPO / "benchmarks" / "fixtures" / "news_articles.json"
+
+# Runs in a fresh interpreter so each peak RSS belongs to one mode
+CHILD = """
+import json, resource, sys, time
+mode, model_name, repeat = sys.argv[1], sys.argv[2], int(sys.argv[3])
+data = json.load(sys.stdin)
+transcript, articles = data["transcript"], data["articles"]
+summary = articles[0]["description"]
+texts = [f"{a['title']} {a['description']} {a.get('content', '')}" for a in articles]
+
+def peak():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+start = time.perf_counter()
+if mode == "separate":
+    from keybert import KeyBERT
+    from sentence_transformers import SentenceTransformer
+    keybert, sentence_model = KeyBERT(), SentenceTransformer(model_name)
+
+    def run():
+        keywords = [k for k, _ in keybert.extract_keywords(transcript, stop_words="english", top_n=5)]
+        sentence_model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        sentence_model.encode([summary], normalize_embeddings=True, convert_to_numpy=True)
+        return keywords
+else:
+    import FAKENEWS
+    FAKENEWS.registry.warm_up(["sentence_model", "keybert"])
+
+    def run():
+        keywords = FAKENEWS.extract_keywords(transcript, top_n=5)
+        FAKENEWS.encode_texts(texts)
+        FAKENEWS.encode_texts([summary])
+        return keywords
+load_seconds = time.perf_counter() - start
+loaded_peak = peak()
+
+keywords = run()  # first call builds the graph, not timed
+best = float("inf")
+for _ in range(repeat):
+    start = time.perf_counter()
+    run()
+    best = min(best, time.perf_counter() - start)
+print(json.dumps({"load_seconds": load_seconds, "loaded_peak": loaded_peak, "run_peak": peak(),
+                  "run_seconds": best, "keywords": keywords}))
+"""
+
+
+def run_mode(mode, model, repeat, payload):
+    env = dict(os.environ, TRUTHLENS_EMBEDDING_MODEL=model, TOKENIZERS_PARALLELISM="false")
+    result = subprocess.run([sys.executable, "-c", CHILD, mode, model, str(repeat)], cwd=REPO, env=env,
+                            input=payload, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcript", help="Text file used as transcript (default: text of fixture articles)")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Sentence embedding model")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per mode, the fastest one is reported")
+    args = parser.parse_args()
+
+    articles = json.loads(FIXTURE.read_text(encoding="utf-8"))["articles"]
+    if args.transcript:
+        transcript = Path(args.transcript).read_text(encoding="utf-8")
+    else:
+        transcript = " ".join(f"{article['description']} {article.get('content') or ''}" for article in articles[:3])
+    payload = json.dumps({"transcript": transcript, "articles": articles})
+
+    results = {mode: run_mode(mode, args.model, args.repeat, payload) for mode in ("separate", "shared")}
+    print(f"{len(articles)} articles, {len(transcript.split())} transcript words, model {args.model}")
+    print(f"{'Mode':<9} {'Load':>7} {'Peak RSS loaded':>16} {'Peak RSS run':>13} {'Keywords+embeddings':>20}")
+    for mode, result in results.items():
+        print(f"{mode:<9} {result['load_seconds']:>6.2f}s {result['loaded_peak'] / 2**20:>13.0f} MB "
+              f"{result['run_peak'] / 2**20:>10.0f} MB {result['run_seconds'] * 1000:>17.1f} ms")
+
+    separate, shared = results["separate"], results["shared"]
+    print(f"Saved: {(separate['run_peak'] - shared['run_peak']) / 2**20:.0f} MB peak memory, "
+          f"{separate['load_seconds'] - shared['load_seconds']:.2f}s loading, "
+          f"{(separate['run_seconds'] - shared['run_seconds']) * 1000:.1f} ms per video")
+    print(f"Keywords: {separate['keywords']} -> {shared['keywords']} "
+          f"({'same' if separate['keywords'] == shared['keywords'] else 'DIFFERENT'})")
+
+
+if __name__ == "__main__":
+    main()
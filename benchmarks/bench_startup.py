@@ -0,0 +1,95 @@
+"""
+Measure GUI cold start: the time from interpreter start until the main window has been shown, and
+what was imported on the way (a `python -X importtime` breakdown by top-level package).
+
+The lazy run is the current startup path. With --eager the same window is built after importing the
+pipeline modules and their ML libraries up front, as main.py used to, for comparison.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --eager --repeat 5 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter: build and show the window, then report how long it took
+CHILD = """
+import sys, time
+start = time.perf_counter()
+if {eager}:
+    import DEEPFAKE, FAKENEWS
+    DEEPFAKE.import_backends()
+    FAKENEWS.import_backends()
+from PyQt6.QtWidgets import QApplication
+import main
+app = QApplication(sys.argv)
+window = main.MainWindow()
+window.show()
+app.processEvents()
+print(time.perf_counter() - start)
+"""
+
+
+def run_child(eager, importtime=False):
+    """Return (seconds until the window is shown, process wall time, importtime stderr)."""
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+               TF_CPP_MIN_LOG_LEVEL="2")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD.format(eager=eager)]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=REPO, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    return float(result.stdout.strip().splitlines()[-1]), wall, result.stderr
+
+
+def import_breakdown(stderr):
+    """Cumulative import time in seconds per top-level package, from `-X importtime` output."""
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by depth; top-level cumulative times include their dependencies
+        name = name[1:]
+        if not name.startswith(" "):
+            totals[name.split(".")[0]] += int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def report(label, eager, repeat, top):
+    runs = [run_child(eager) for _ in range(repeat)]
+    shown = min(seconds for seconds, _, _ in runs)
+    wall = min(seconds for _, seconds, _ in runs)
+    _, _, stderr = run_child(eager, importtime=True)
+    breakdown = import_breakdown(stderr)
+
+    print(f"{label}: imports and window shown in {shown:.2f}s (whole process {wall:.2f}s, best of {repeat})")
+    print(f"  {len(breakdown)} top-level imports, {sum(seconds for _, seconds in breakdown):.2f}s in total; slowest:")
+    for name, seconds in breakdown[:top]:
+        print(f"    {name:<28} {seconds:7.3f}s")
+    return shown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eager", action="store_true", help="Also measure startup with the ML stack imported first")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode, the best one is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    args = parser.parse_args()
+
+    lazy = report("Lazy", False, args.repeat, args.top)
+    if args.eager:
+        eager = report("Eager", True, args.repeat, args.top)
+        print(f"Window visible {eager - lazy:.2f}s sooner ({eager / lazy:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
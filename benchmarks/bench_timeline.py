@@ -0,0 +1,66 @@
+"""
+Check that sliding-window timeline scoring grows linearly with video length.
+
+Synthetic clips of increasing duration (the test video looped with ffmpeg) are scored by
+`timeline_prediction`. For each clip the faces, windows and wall time of the feature pass (decoding,
+detection, ResNet50 once per face) and of the window scoring (batched LSTM) are reported, with the time
+per face. The script fails (exit code 1) if the time per face of the longest clip exceeds that of the
+shortest by more than --max-ratio.
+
+Usage:
+    python benchmarks/bench_timeline.py
+    python benchmarks/bench_timeline.py --durations 60 240 960 --stride 27
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+from common import run_from_repository
+
+run_from_repository()
+
+import DEEPFAKE
+from bench_memory_bound import make_clip
+from model_registry import registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 120, 480], help="Clip lengths in seconds")
+    parser.add_argument("--stride", type=int, default=DEEPFAKE.TIMELINE_STRIDE, help="Faces between two windows")
+    parser.add_argument("--max-ratio", type=float, default=1.5, help="Allowed growth of the time per face")
+    args = parser.parse_args()
+
+    registry.warm_up(['mtcnn', 'resnet50_features', 'deepfake_classifier'])
+    per_face = []
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'Clip':>6} {'Faces':>6} {'Windows':>8} {'Features':>9} {'Scoring':>8} {'Per face':>9} {'P(fake)':>8}")
+        for seconds in sorted(args.durations):
+            clip = make_clip(seconds, directory)
+            start = time.perf_counter()
+            positions, features = DEEPFAKE.timeline_features(clip)
+            feature_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            starts, probabilities = DEEPFAKE.score_windows(features, stride=args.stride)
+            scoring_seconds = time.perf_counter() - start
+
+            per_face.append((feature_seconds + scoring_seconds) / max(1, len(positions)))
+            print(f"{seconds:>5}s {len(positions):>6} {len(starts):>8} {feature_seconds:>8.1f}s "
+                  f"{scoring_seconds:>7.2f}s {per_face[-1] * 1000:>7.1f}ms {probabilities.max():>8.4f}")
+
+    ratio = per_face[-1] / per_face[0]
+    print(f"Time per face from {min(args.durations)}s to {max(args.durations)}s: x{ratio:.2f} "
+          f"(limit x{args.max_ratio:.2f})")
+    if ratio > args.max_ratio:
+        print("Linear scaling FAILED")
+        return 1
+    print("Cost grows linearly")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
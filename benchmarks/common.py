@@ -0,0 +1,29 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Importing this module makes the repository modules (DEEPFAKE, FAKENEWS, ...) importable from the scripts.
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+if str(REPO) not in sys.path:
+    sys.path.insert(0, str(REPO))
+
+
+def run_from_repository():
+    """Change to the repository root, since my_model.keras is loaded relative to it."""
+    os.chdir(REPO)
+
+
+def time_it(function, repeat=3):
+    """Call `function` `repeat` times and return (fastest time in seconds, result of the last call)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
@@ -0,0 +1,279 @@
+"""
+End-to-end benchmark of every stage of both pipelines.
+
+Runs each stage on fake_test_video.mp4 and on synthetic clips of configurable length and resolution
+(the test clip looped and rescaled with ffmpeg, so they contain faces and speech) and reports wall time,
+throughput and peak RSS per stage as JSON, tagged with the current commit so runs can be compared.
+
+News retrieval goes through the real NewsAPI client, pointed at a local HTTP stub that serves
+benchmarks/fixtures/news_articles.json, so no API key or network access is needed.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --synthetic 60x1280x720 300x1920x1080 --skip-news
+    python benchmarks/run_benchmarks.py --stages frame_decode face_detection feature_extraction
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+from common import REPO, run_from_repository
+
+run_from_repository()
+
+FIXTURE = REPO / "benchmarks" / "fixtures" / "news_articles.json"
+TEST_VIDEO = REPO / "fake_test_video.mp4"
+
+DEEPFAKE_STAGES = ["frame_decode", "face_detection", "feature_extraction", "lstm_classification"]
+NEWS_STAGES = ["audio_extract", "transcription", "keywords", "retrieval", "embedding", "summarization"]
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No /proc (macOS): fall back to the peak so far
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RSSSampler:
+    """Polls the RSS in a background thread to find the peak reached during a stage."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_rss = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class StageRecorder:
+    def __init__(self, selected):
+        self.selected = selected
+        self.results = {}
+
+    def wanted(self, name):
+        return not self.selected or name in self.selected
+
+    @contextmanager
+    def stage(self, name, unit):
+        """Time a stage. The body sets result["items"] to the number of `unit`s it processed."""
+        result = {"items": None}
+        with RSSSampler() as rss:
+            start = time.perf_counter()
+            yield result
+            seconds = time.perf_counter() - start
+        items = result["items"]
+        self.results[name] = {
+            "seconds": round(seconds, 4),
+            "items": items,
+            "unit": unit,
+            "throughput": round(items / seconds, 3) if items and seconds > 0 else None,
+            "peak_rss_mb": round(rss.peak / 2**20, 1),
+            "rss_growth_mb": round((rss.peak - rss.start_rss) / 2**20, 1),
+        }
+        print(f"  {name:<20} {seconds:8.3f}s  {self.results[name]['throughput'] or '-':>10} {unit}/s"
+              f"  peak {self.results[name]['peak_rss_mb']} MB")
+
+
+def make_synthetic_clip(spec, directory):
+    """Loop and rescale the test video with ffmpeg. `spec` is SECONDSxWIDTHxHEIGHT, e.g. 60x1280x720."""
+    import FAKENEWS
+
+    seconds, width, height = (int(value) for value in spec.split("x"))
+    path = os.path.join(directory, f"synthetic_{spec}.mp4")
+    subprocess.run([
+        FAKENEWS._ffmpeg_executable(), "-y", "-loglevel", "error", "-stream_loop", "-1", "-i", str(TEST_VIDEO),
+        "-t", str(seconds), "-vf", f"scale={width}:{height}", "-c:v", "libx264", "-preset", "veryfast",
+        "-c:a", "aac", path,
+    ], check=True)
+    return path
+
+
+def start_news_stub():
+    """Local HTTP stand-in for NewsAPI serving the fixture articles. Every query gets results."""
+    from news_client import FixtureBackend
+
+    backend = FixtureBackend(str(FIXTURE))
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = parse_qs(urlparse(self.path).query)
+            page = int(params.get("page", ["1"])[0])
+            page_size = int(params.get("pageSize", ["20"])[0])
+            articles, total = backend.fetch_page(params.get("q", [""])[0], page, page_size, "relevance")
+            if not total:
+                # Nothing matches the keywords: serve everything so the later stages have work to do
+                articles = backend.articles[(page - 1) * page_size:page * page_size]
+                total = len(backend.articles)
+            body = json.dumps({"status": "ok", "totalResults": total, "articles": articles}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v2/everything"
+
+
+def bench_deepfake(video_path, recorder):
+    import DEEPFAKE
+
+    frames = faces = features = None
+    if recorder.wanted("frame_decode") or recorder.wanted("face_detection"):
+        with recorder.stage("frame_decode", "frames") as result:
+            frames = [frame for _, frame in DEEPFAKE.iter_video_frames(video_path, DEEPFAKE.FRAME_INTERVAL)]
+            result["items"] = len(frames)
+    if frames is not None and (recorder.wanted("face_detection") or recorder.wanted("feature_extraction")):
+        with recorder.stage("face_detection", "frames") as result:
+            faces = DEEPFAKE.extract_highest_confidence_face_from_frames(
+                frames, DEEPFAKE.DETECTION_MAX_DIMENSION, DEEPFAKE.DETECTION_WORKERS, DEEPFAKE.DETECTION_EXECUTOR)
+            result["items"] = len(frames)
+    del frames
+    if faces is not None and (recorder.wanted("feature_extraction") or recorder.wanted("lstm_classification")):
+        with recorder.stage("feature_extraction", "faces") as result:
+            features = DEEPFAKE.feature_extraction(faces)
+            result["items"] = len(faces)
+    if features is not None and recorder.wanted("lstm_classification"):
+        with recorder.stage("lstm_classification", "videos") as result:
+            DEEPFAKE.classify_features(features)
+            result["items"] = 1
+
+
+def bench_news(video_path, recorder, news_client):
+    import FAKENEWS
+    import summarization
+
+    audio = transcript = keywords = articles = None
+    with recorder.stage("audio_extract", "audio_seconds") as result:
+        audio = FAKENEWS.load_audio(video_path)
+        result["items"] = round(len(audio) / FAKENEWS.SAMPLE_RATE, 2)
+    if recorder.wanted("transcription") or recorder.wanted("keywords"):
+        with recorder.stage("transcription", "audio_seconds") as result:
+            transcript = FAKENEWS.registry.get('whisper_base').transcribe(audio)["text"]
+            result["items"] = round(len(audio) / FAKENEWS.SAMPLE_RATE, 2)
+    if transcript is not None and (recorder.wanted("keywords") or recorder.wanted("retrieval")):
+        with recorder.stage("keywords", "documents") as result:
+            keywords = FAKENEWS.extract_keywords(transcript, top_n=5)
+            result["items"] = 1
+    if recorder.wanted("retrieval") or recorder.wanted("embedding") or recorder.wanted("summarization"):
+        with recorder.stage("retrieval", "articles") as result:
+            articles = news_client.search(keywords or ["news"], max_results=50) or []
+            result["items"] = len(articles)
+    if articles and recorder.wanted("embedding"):
+        with recorder.stage("embedding", "articles") as result:
+            FAKENEWS.embed_articles(articles)
+            result["items"] = len(articles)
+    if articles and recorder.wanted("summarization"):
+        texts = [transcript or articles[0]["description"]] + [article["content"] for article in articles[:5]]
+        summarization._memory.clear()  # summaries of the previous clip would be served from memory
+        with recorder.stage("summarization", "texts") as result:
+            summarization.summarize(texts[:1], max_length=70, min_length=50)
+            summarization.summarize(texts[1:], max_length=100, min_length=100)
+            result["items"] = len(texts)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", nargs="*", default=["60x1280x720"],
+                        help="Synthetic clips as SECONDSxWIDTHxHEIGHT (default: 60x1280x720)")
+    parser.add_argument("--videos", nargs="*", default=[str(TEST_VIDEO)], help="Real clips to benchmark")
+    parser.add_argument("--stages", nargs="*", choices=DEEPFAKE_STAGES + NEWS_STAGES, help="Only run these stages")
+    parser.add_argument("--skip-deepfake", action="store_true", help="Skip the deepfake stages")
+    parser.add_argument("--skip-news", action="store_true", help="Skip the news stages")
+    parser.add_argument("--output", "-o", help="Write the JSON report to this file (default: stdout)")
+    args = parser.parse_args()
+
+    from model_registry import registry
+    from news_client import NewsAPIBackend, NewsClient
+
+    stub, stub_url = start_news_stub()
+    # No result cache and no search cache: every stage does its full work
+    news_client = NewsClient(NewsAPIBackend(api_key="benchmark", base_url=stub_url), cache_ttl=0)
+
+    # Load the models up front so their load time is reported separately from the stages
+    if not args.skip_deepfake:
+        import DEEPFAKE
+    if not args.skip_news:
+        import FAKENEWS
+    registry.warm_up()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "model_load_seconds": {name: metrics["last_load_seconds"] for name, metrics in registry.metrics().items()
+                               if metrics["loaded"]},
+        "clips": [],
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        clips = [(Path(video).name, video) for video in args.videos]
+        clips += [(f"synthetic_{spec}", make_synthetic_clip(spec, directory)) for spec in args.synthetic]
+
+        for name, path in clips:
+            print(f"{name}:")
+            recorder = StageRecorder(args.stages)
+            if not args.skip_deepfake:
+                bench_deepfake(path, recorder)
+            if not args.skip_news:
+                bench_news(path, recorder, news_client)
+            report["clips"].append({"name": name, "bytes": os.path.getsize(path), "stages": recorder.results})
+
+    stub.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Report written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import requests
+
+
+class InferenceClient:
+    """
+    Thin client of inference_server.py. `prediction` and `fake_news_detection` take the same arguments
+    and return the same values as the local pipelines, so the GUI can use either.
+    The cache argument is ignored: the server uses its own cache.
+    """
+
+    def __init__(self, base_url, timeout=600):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post(self, endpoint, video_path, control):
+        if control is not None:
+            control.stage('remote', self.base_url)
+        response = self.session.post(f"{self.base_url}{endpoint}", json={"video_path": os.path.abspath(video_path)},
+                                     timeout=self.timeout)
+        if control is not None:
+            control.check()
+        if response.status_code != 200:
+            raise RuntimeError(f"Inference server error {response.status_code}: {response.text}")
+        return response.json()
+
+    def prediction(self, video_path, cache=None, control=None):
+        result = self._post('/deepfake', video_path, control)
+        return np.array([[result['fake_probability']]], dtype=np.float32)
+
+    def fake_news_detection(self, video_path, cache=None, control=None):
+        return self._post('/news', video_path, control)['articles']
+
+    def stats(self):
+        return self.session.get(f"{self.base_url}/stats", timeout=self.timeout).json()
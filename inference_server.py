@@ -0,0 +1,301 @@
+"""
+Local HTTP inference service that keeps the DEEPFAKE and FAKENEWS models resident.
+
+ResNet50 feature requests and sentence-embedding requests from concurrent jobs are merged into shared
+batches by dynamic micro-batchers. The GUI becomes a thin client when TRUTHLENS_SERVER_URL is set.
+
+Endpoints:
+    POST /deepfake  {"video_path": "..."}  ->  {"fake_probability": 0.93, "verdict": "FAKE", "seconds": 12.1}
+    POST /news      {"video_path": "..."}  ->  {"articles": [...], "seconds": 30.4}
+    GET  /stats     queue depth, p50/p95 latency per endpoint, batcher, model and cache statistics
+    GET  /metrics   per-stage timings and pipeline counters in the Prometheus text format
+    GET  /health
+
+Usage:
+    python inference_server.py --port 8765 --max-jobs 4
+"""
+import argparse
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Merges requests from concurrent callers into shared batches.
+
+    Each request is a batch of items (an array or a list). A background thread waits for the first
+    request, keeps collecting requests for up to `max_wait` seconds or until `max_batch_size` items are
+    queued, runs `batch_fn` once on all of them and hands each caller its slice of the output.
+
+    Args:
+    - name (str): Name used in stats.
+    - batch_fn (callable): Maps a concatenated batch to an output with one row per item.
+    - max_batch_size (int): Number of items that triggers a batch without waiting further.
+    - max_wait (float): Longest time the first request of a batch waits for others, in seconds.
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=64, max_wait=0.01):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "items": 0, "batches": 0}
+
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, items):
+        """Queue a batch of items and return a Future of their outputs."""
+        future = Future()
+        self._queue.put((items, future))
+        return future
+
+    def __call__(self, items):
+        return self.submit(items).result()
+
+    def _run(self):
+        while True:
+            requests = [self._queue.get()]
+            size = len(requests[0][0])
+            deadline = time.monotonic() + self.max_wait
+
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                size += len(request[0])
+
+            self._run_batch(requests)
+
+    def _run_batch(self, requests):
+        all_items = [request[0] for request in requests]
+        if isinstance(all_items[0], np.ndarray):
+            batch = np.concatenate(all_items, axis=0)
+        else:
+            batch = [item for items in all_items for item in items]
+
+        try:
+            outputs = self.batch_fn(batch)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+
+        start = 0
+        for items, future in requests:
+            future.set_result(outputs[start:start + len(items)])
+            start += len(items)
+
+        with self._lock:
+            self._stats["requests"] += len(requests)
+            self._stats["items"] += len(batch)
+            self._stats["batches"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["mean_batch_size"] = round(stats["items"] / stats["batches"], 2) if stats["batches"] else 0
+        return stats
+
+
+class LatencyTracker:
+    """Queue depth, requests in flight and rolling latencies (p50/p95) of one endpoint."""
+
+    def __init__(self, window=1000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.count = 0
+        self.errors = 0
+
+    def queued(self):
+        with self._lock:
+            self.waiting += 1
+
+    def started(self):
+        with self._lock:
+            self.waiting -= 1
+            self.in_flight += 1
+
+    def finished(self, seconds, error=False):
+        with self._lock:
+            self.in_flight -= 1
+            self._latencies.append(seconds)
+            self.count += 1
+            self.errors += error
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            stats = {"requests": self.count, "errors": self.errors, "in_flight": self.in_flight,
+                     "queue_depth": self.waiting}
+        if len(latencies):
+            stats["p50_seconds"] = round(float(np.percentile(latencies, 50)), 3)
+            stats["p95_seconds"] = round(float(np.percentile(latencies, 95)), 3)
+        return stats
+
+
+class InferenceService:
+    """
+    Runs the two pipelines for the HTTP handler, with at most `max_jobs` pipelines at a time and
+    micro-batched ResNet50 and sentence-embedding calls.
+    """
+
+    def __init__(self, max_jobs=4, max_batch_size=64, max_wait=0.01, use_cache=True):
+        import DEEPFAKE
+        import FAKENEWS
+        from instrumentation import PrometheusSink, instrumentation
+        from model_registry import registry
+        from result_cache import default_cache
+
+        self.prometheus = instrumentation.add_sink(PrometheusSink())
+        self.deepfake = DEEPFAKE
+        self.fakenews = FAKENEWS
+        self.registry = registry
+        self.cache = default_cache() if use_cache else None
+
+        self.feature_batcher = MicroBatcher("resnet50", DEEPFAKE.resnet_features, max_batch_size, max_wait)
+        self.embedding_batcher = MicroBatcher("sentence_embeddings", FAKENEWS.encode_texts, max_batch_size, max_wait)
+
+        self._jobs = threading.Semaphore(max_jobs)
+        self._job_ids = itertools.count(1)
+        self.latency = {"deepfake": LatencyTracker(), "news": LatencyTracker()}
+
+    def warm_up(self):
+        self.registry.warm_up()
+
+    def _run(self, endpoint, function):
+        from instrumentation import job_context
+
+        tracker = self.latency[endpoint]
+        start = time.perf_counter()
+        tracker.queued()
+        with self._jobs:
+            tracker.started()
+            error = False
+            try:
+                with job_context(f"{endpoint}-{next(self._job_ids)}"):
+                    return function()
+            except Exception:
+                error = True
+                raise
+            finally:
+                tracker.finished(time.perf_counter() - start, error)
+
+    def deepfake_verdict(self, video_path):
+        start = time.perf_counter()
+        predictions = self._run("deepfake", lambda: self.deepfake.prediction(
+            video_path, cache=self.cache, extractor=self.feature_batcher))
+        probability = float(np.asarray(predictions).ravel()[0])
+        return {"fake_probability": probability, "verdict": "FAKE" if probability > 0.5 else "REAL",
+                "seconds": round(time.perf_counter() - start, 3)}
+
+    def news_verification(self, video_path):
+        start = time.perf_counter()
+        articles = self._run("news", lambda: self.fakenews.fake_news_detection(
+            video_path, cache=self.cache, encoder=self.embedding_batcher))
+        return {"articles": articles, "seconds": round(time.perf_counter() - start, 3)}
+
+    def stats(self):
+        return {
+            "endpoints": {name: tracker.stats() for name, tracker in self.latency.items()},
+            "batchers": {batcher.name: batcher.stats() for batcher in (self.feature_batcher, self.embedding_batcher)},
+            "models": self.registry.metrics(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    service = None  # set by serve()
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.service.stats())
+        elif self.path == "/metrics":
+            self._send(200, self.service.prometheus.render().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        routes = {"/deepfake": self.service.deepfake_verdict, "/news": self.service.news_verification}
+        if self.path not in routes:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            video_path = json.loads(self.rfile.read(length))["video_path"]
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": "Expected a JSON body with a 'video_path'"})
+            return
+
+        try:
+            self._send_json(200, routes[self.path](video_path))
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+
+def serve(host="127.0.0.1", port=8765, warm_up=True, **service_options):
+    service = InferenceService(**service_options)
+    if warm_up:
+        service.warm_up()
+    InferenceHandler.service = service
+    server = ThreadingHTTPServer((host, port), InferenceHandler)
+    print(f"Inference server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--max-jobs", type=int, default=4, help="Pipelines running at the same time")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Items that trigger a shared batch")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="How long a batch waits for more requests")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the on-disk result cache")
+    parser.add_argument("--no-warm-up", action="store_true", help="Load models on first request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    serve(args.host, args.port, warm_up=not args.no_warm_up, max_jobs=args.max_jobs,
+          max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000, use_cache=not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+# Sinks can be enabled in the .env file
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Id of the analysis job the current thread works for, attached to every event
+_job_id = contextvars.ContextVar('truthlens_job_id', default=None)
+
+
+@contextmanager
+def job_context(job_id):
+    """Tag every event emitted inside the block with `job_id`."""
+    token = _job_id.set(job_id)
+    try:
+        yield
+    finally:
+        _job_id.reset(token)
+
+
+def current_job():
+    return _job_id.get()
+
+
+class _NullSpan:
+    """Returned by `span()` when no sink is attached, so disabled instrumentation costs one check."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times a block of code. Emits a "span_start" event on entry and a "span" event with the duration on exit."""
+
+    def __init__(self, instrumentation, name, attrs):
+        self._instrumentation = instrumentation
+        self.name = name
+        self.attrs = attrs
+        self._start = None
+
+    def set(self, **attrs):
+        """Attach more attributes to the span, e.g. the number of items processed."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._instrumentation._emit({"kind": "span_start", "name": self.name, "attrs": dict(self.attrs)})
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        status = "ok" if exc_type is None else exc_type.__name__
+        self._instrumentation._emit({"kind": "span", "name": self.name, "attrs": self.attrs,
+                                     "duration": duration, "status": status})
+        return False
+
+
+class Instrumentation:
+    """
+    Timing spans and counters around the pipeline stages, dispatched to pluggable sinks.
+
+    A sink is any callable taking an event dict with the keys "kind" ("span_start", "span" or "counter"),
+    "name", "attrs", "job_id" and "time", plus "duration" and "status" for spans and "value" for counters.
+    With no sink attached `span()` returns a shared no-op and `count()` returns immediately.
+    """
+
+    def __init__(self):
+        self._sinks = ()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self._sinks)
+
+    def add_sink(self, sink):
+        with self._lock:
+            self._sinks = self._sinks + (sink,)
+        return sink
+
+    def remove_sink(self, sink):
+        with self._lock:
+            self._sinks = tuple(s for s in self._sinks if s is not sink)
+
+    def span(self, name, **attrs):
+        """Context manager timing a stage: `with span('faces', pipeline='deepfake') as s: ...`."""
+        if not self._sinks:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+
+    def count(self, name, value=1, **attrs):
+        """Add `value` to the counter `name`, e.g. count('frames_decoded', 120, pipeline='deepfake')."""
+        if not self._sinks:
+            return
+        self._emit({"kind": "counter", "name": name, "attrs": attrs, "value": value})
+
+    def _emit(self, event):
+        event["job_id"] = _job_id.get()
+        event["time"] = time.time()
+        for sink in self._sinks:
+            try:
+                sink(event)
+            except Exception:
+                logger.exception("Instrumentation sink %r failed", sink)
+
+
+class LoggingSink:
+    """Writes finished spans and counters to a logger."""
+
+    def __init__(self, logger_name='truthlens.metrics', level=logging.INFO):
+        self.logger = logging.getLogger(logger_name)
+        self.level = level
+
+    def __call__(self, event):
+        attrs = " ".join(f"{key}={value}" for key, value in event["attrs"].items())
+        job = f"[{event['job_id']}] " if event["job_id"] else ""
+        if event["kind"] == "span":
+            self.logger.log(self.level, "%s%s took %.3fs (%s) %s", job, event["name"], event["duration"],
+                            event["status"], attrs)
+        elif event["kind"] == "counter":
+            self.logger.log(self.level, "%s%s +%s %s", job, event["name"], event["value"], attrs)
+
+
+class JSONLinesSink:
+    """Appends every event to a JSON-lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _metric_name(name):
+    return "truthlens_" + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _label_string(labels):
+    if not labels:
+        return ""
+    pairs = ",".join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                     for key, value in labels)
+    return "{" + pairs + "}"
+
+
+class PrometheusSink:
+    """
+    Aggregates counters and span durations and renders them in the Prometheus text format.
+
+    Counters become `truthlens_<name>_total`, spans become `truthlens_<name>_seconds` summaries (sum and
+    count). Labels are the event attributes, except the per-job id. If `path` is given the file is
+    rewritten after every span, for the node_exporter textfile collector.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._counters = defaultdict(float)
+        self._durations = defaultdict(lambda: [0.0, 0])
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        if event["kind"] == "span_start":
+            return
+        labels = tuple(sorted((key, value) for key, value in event["attrs"].items()
+                              if isinstance(value, (str, int, float, bool))))
+        with self._lock:
+            if event["kind"] == "counter":
+                self._counters[(event["name"], labels)] += event["value"]
+            else:
+                summary = self._durations[(event["name"], labels + (("status", event["status"]),))]
+                summary[0] += event["duration"]
+                summary[1] += 1
+        if self.path and event["kind"] == "span":
+            self.write(self.path)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            durations = sorted(self._durations.items())
+        declared = set()
+        for (name, labels), value in counters:
+            metric = _metric_name(name) + "_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_label_string(labels)} {value:g}")
+        for (name, labels), (total, count) in durations:
+            metric = _metric_name(name) + "_seconds"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_sum{_label_string(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{_label_string(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the current metrics to `path` atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+def configure_from_env(instrumentation):
+    """
+    Attach the sinks selected in the environment:
+    TRUTHLENS_METRICS_LOG=1 logs every span and counter, TRUTHLENS_METRICS_JSONL appends the events to a
+    file and TRUTHLENS_METRICS_PROMETHEUS keeps a Prometheus textfile up to date.
+    """
+    if os.getenv('TRUTHLENS_METRICS_LOG') == '1':
+        instrumentation.add_sink(LoggingSink())
+    if os.getenv('TRUTHLENS_METRICS_JSONL'):
+        instrumentation.add_sink(JSONLinesSink(os.getenv('TRUTHLENS_METRICS_JSONL')))
+    if os.getenv('TRUTHLENS_METRICS_PROMETHEUS'):
+        instrumentation.add_sink(PrometheusSink(os.getenv('TRUTHLENS_METRICS_PROMETHEUS')))
+
+
+# Shared by the whole application
+instrumentation = Instrumentation()
+configure_from_env(instrumentation)
+
+span = instrumentation.span
+count = instrumentation.count
@@ -0,0 +1,166 @@
+import itertools
+import os
+import threading
+import traceback
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from instrumentation import instrumentation, job_context
+from pipeline_control import JobCancelled, JobControl
+
+_job_ids = itertools.count(1)
+
+
+# The pipeline modules pull in TensorFlow, Whisper and transformers. They are imported on first use by
+# the worker threads (or by preload_pipelines), never on the GUI thread, so the window opens at once.
+def _local_prediction(video_path, cache=None, control=None, media=None):
+    from DEEPFAKE import prediction
+    return prediction(video_path, cache=cache, control=control, media=media)
+
+def _local_fake_news_detection(video_path, cache=None, control=None, media=None):
+    from FAKENEWS import fake_news_detection
+    return fake_news_detection(video_path, cache=cache, control=control, media=media)
+
+
+def preload_pipelines(warm_up=False):
+    """
+    Import the pipeline modules and their ML libraries in a background thread, and load their models
+    too if `warm_up`.
+    A job started meanwhile simply waits in its worker thread for the imports to finish.
+    Does nothing when the GUI uses an inference server.
+    """
+    if os.getenv('TRUTHLENS_SERVER_URL'):
+        return None
+
+    def preload():
+        import DEEPFAKE
+        import FAKENEWS
+        if warm_up:
+            from model_registry import registry
+            registry.warm_up()
+        else:
+            DEEPFAKE.import_backends()
+            FAKENEWS.import_backends()
+
+    thread = threading.Thread(target=preload, name='preload-pipelines', daemon=True)
+    thread.start()
+    return thread
+
+
+class JobSignals(QObject):
+    """
+    Signals of an AnalysisJob. They are emitted from worker threads and delivered on the GUI thread.
+    """
+    progress = pyqtSignal(str, str, str)   # pipeline, stage, message
+    deepfake_ready = pyqtSignal(object)    # prediction score array
+    news_ready = pyqtSignal(object)        # list of summarized articles, or None
+    failed = pyqtSignal(str, str)          # pipeline, error message
+    event = pyqtSignal(object)             # instrumentation event (span or counter) of this job
+    finished = pyqtSignal()
+
+
+class _PipelineRunnable(QRunnable):
+    def __init__(self, job, pipeline, function, ready_signal):
+        super().__init__()
+        self.job = job
+        self.pipeline = pipeline
+        self.function = function
+        self.ready_signal = ready_signal
+
+    def run(self):
+        job = self.job
+        try:
+            # Only the local pipelines take the shared media ingest, see AnalysisJob.start
+            options = {'media': job.media} if job.media is not None else {}
+            with job_context(job.id):
+                result = self.function(job.video_path, cache=job.cache, control=job.controls[self.pipeline],
+                                       **options)
+            if not job.cancelled:
+                self.ready_signal.emit(result)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            traceback.print_exc()
+            if not job.cancelled:
+                job.signals.failed.emit(self.pipeline, str(e))
+        finally:
+            job._pipeline_done(self.pipeline)
+
+
+class AnalysisJob:
+    """
+    Runs the deepfake and fake news analyses of one video in parallel on a QThreadPool.
+
+    Each result is posted through `signals` as soon as its pipeline is done, stage progress is streamed
+    through `signals.progress`, and `cancel()` stops both pipelines at their next stage or frame.
+    Instrumentation spans and counters of this job are forwarded through `signals.event` while it runs.
+    With TRUTHLENS_SINGLE_PASS_INGEST=1 both local pipelines read the video from one demux, see media_ingest.py.
+    Nothing is emitted after a job has been cancelled.
+
+    Must be created on the GUI thread so its signals are delivered there.
+    """
+
+    def __init__(self, video_path, cache=None, pool=None):
+        server_url = os.getenv('TRUTHLENS_SERVER_URL')
+        self._local = not server_url
+        if server_url:
+            # Thin client: the models stay resident in inference_server.py
+            from inference_client import InferenceClient
+            client = InferenceClient(server_url)
+            prediction, fake_news_detection = client.prediction, client.fake_news_detection
+        else:
+            prediction, fake_news_detection = _local_prediction, _local_fake_news_detection
+
+        self.id = f"job-{next(_job_ids)}"
+        self.video_path = video_path
+        self.cache = cache
+        self.pool = pool or QThreadPool.globalInstance()
+        self.signals = JobSignals()
+        self.media = None
+
+        self._pipelines = [
+            ("deepfake", prediction, self.signals.deepfake_ready),
+            ("news", fake_news_detection, self.signals.news_ready),
+        ]
+        self.controls = {
+            name: JobControl(progress=self._progress_callback(name)) for name, _, _ in self._pipelines
+        }
+        self._remaining = len(self._pipelines)
+        self._lock = threading.Lock()
+
+    def _progress_callback(self, pipeline):
+        def progress(stage, message):
+            self.signals.progress.emit(pipeline, stage, message)
+        return progress
+
+    def _forward_event(self, event):
+        if event["job_id"] == self.id and not self.cancelled:
+            self.signals.event.emit(event)
+
+    def start(self):
+        if self._local:
+            from media_ingest import open_media
+            self.media = open_media(self.video_path)
+        instrumentation.add_sink(self._forward_event)
+        for name, function, ready_signal in self._pipelines:
+            self.pool.start(_PipelineRunnable(self, name, function, ready_signal))
+
+    def cancel(self):
+        for control in self.controls.values():
+            control.cancel()
+
+    @property
+    def cancelled(self):
+        return any(control.cancelled for control in self.controls.values())
+
+    def _pipeline_done(self, pipeline):
+        if self.media is not None:
+            # A pipeline that returned without reading its stream (e.g. a cache hit) must not hold back the other
+            self.media.release('video' if pipeline == 'deepfake' else 'audio')
+        with self._lock:
+            self._remaining -= 1
+            done = self._remaining == 0
+        if done:
+            instrumentation.remove_sink(self._forward_event)
+        if done and not self.cancelled:
+            self.signals.finished.emit()
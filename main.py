@@ -1,7 +1,10 @@
+import logging
+import os
 import sys
 from PyQt6.QtWidgets import QApplication, QMainWindow, QStackedWidget
 from main_screen import MainScreen
 from second_screen import SecondScreen
+from job_runner import preload_pipelines
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -24,10 +27,16 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.stacked_widget)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     app = QApplication(sys.argv)
 
     main_window = MainWindow()
     main_window.show()
 
+    if os.getenv("TRUTHLENS_PRELOAD", "1") == "1":
+        # Only PyQt is loaded so far: import the pipelines in the background now that the window is up,
+        # and load every model too with TRUTHLENS_WARMUP=1 so the first video does not pay the load cost
+        preload_pipelines(warm_up=os.getenv("TRUTHLENS_WARMUP") == "1")
+
     sys.exit(app.exec())
 
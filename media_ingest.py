@@ -0,0 +1,249 @@
+"""
+Single-pass media ingest shared by the deepfake and fake news pipelines.
+
+Without it every upload is read from disk twice: OpenCV decodes the video stream for face detection and
+ffmpeg decodes the audio stream for Whisper, each demuxing the whole container. `MediaIngest` opens the
+file once with PyAV in a background thread and demuxes both streams together. The sampled video frames
+go to the face detector through a bounded queue and the audio, resampled to 16 kHz mono PCM, goes to
+transcription, so both pipelines consume the same read concurrently.
+
+Enabled with TRUTHLENS_SINGLE_PASS_INGEST=1 for the jobs of the GUI, see job_runner.AnalysisJob. When
+PyAV is not installed the pipelines read the file themselves, as before.
+"""
+import importlib.util
+import logging
+import os
+import queue
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+from instrumentation import count
+
+# Ingest settings can be set in the .env file
+load_dotenv()
+
+SINGLE_PASS_INGEST = os.getenv('TRUTHLENS_SINGLE_PASS_INGEST', '0') == '1'
+# Decoded frames waiting for the face detector use at most this much memory
+INGEST_BUFFER_MB = int(os.getenv('TRUTHLENS_INGEST_BUFFER_MB', '256'))
+# Whisper works on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+STREAMS = ('video', 'audio')
+_END = object()
+
+logger = logging.getLogger(__name__)
+
+
+class MediaIngest:
+    """
+    Demuxes a video once and hands its sampled frames and its audio to two consumers.
+
+    Demuxing starts when the frame consumer calls `frames()` with the frame indices it wants (or
+    releases the video stream). Only those frames are converted to arrays; they wait in a queue bounded
+    to `buffer_mb`, so a slow face detector holds back the demuxer instead of filling the memory. The
+    audio is not bounded that way: it is only 64 KB per second, the same the whole-track decode kept,
+    and a transcription that has not started yet must never stall face detection.
+
+    Since the demux goes at the pace of the frame consumer, the audio consumer should work chunk by chunk
+    with `iter_audio`: `read_audio` only returns once face detection has gone through nearly the whole video.
+
+    A consumer that no longer needs its stream calls `release()`, after which that stream is skipped.
+    Each stream can be consumed once. Errors of the demuxer are raised in the consumers.
+
+    Args:
+    - video_path (str): Path to the video file.
+    - sample_rate (int): Audio sample rate handed to the audio consumer.
+    - buffer_mb (int): Memory limit of the frame queue.
+    """
+
+    def __init__(self, video_path, sample_rate=SAMPLE_RATE, buffer_mb=INGEST_BUFFER_MB):
+        self.video_path = video_path
+        self.sample_rate = sample_rate
+        self.buffer_bytes = buffer_mb * 2**20
+        self.total_frames = 0
+        self.fps = 0.0
+        self.has_video = False
+        self.has_audio = False
+
+        self._opened = threading.Event()
+        self._video_ready = threading.Event()  # set once the frame positions are known or video is released
+        self._positions = None
+        self._released = {stream: threading.Event() for stream in STREAMS}
+        self._frames = None
+        self._audio = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='media-ingest', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            import av
+
+            with av.open(self.video_path) as container:
+                video = container.streams.video[0] if container.streams.video else None
+                audio = container.streams.audio[0] if container.streams.audio else None
+                if video is not None:
+                    video.thread_type = 'AUTO'
+                    self.total_frames = video.frames
+                    self.fps = float(video.average_rate or 0)
+                    frame_bytes = max(1, video.codec_context.width * video.codec_context.height * 3)
+                    self._frames = queue.Queue(maxsize=max(2, self.buffer_bytes // frame_bytes))
+                    self.has_video = True
+                self.has_audio = audio is not None
+                self._opened.set()
+
+                self._video_ready.wait()
+                self._demux(av, container, video, audio)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._opened.set()
+            self._put_frame(_END)
+            self._audio.put(_END)
+
+    def _demux(self, av, container, video, audio):
+        positions = iter(self._positions if video is not None and self._positions is not None else ())
+        target = next(positions, None)
+        index = 0
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=self.sample_rate) if audio else None
+        streams = [stream for stream in (video, audio) if stream is not None]
+
+        for packet in container.demux(streams):
+            video_done = target is None or self._released['video'].is_set()
+            if video_done and (audio is None or self._released['audio'].is_set()):
+                break
+            if packet.stream is video:
+                if video_done:
+                    continue
+                # Every frame is decoded since later frames depend on it, only the sampled ones are converted
+                for frame in packet.decode():
+                    if index == target:
+                        self._put_frame((index, frame.to_ndarray(format='bgr24')))
+                        target = next(positions, None)
+                    index += 1
+            elif not self._released['audio'].is_set():
+                for frame in packet.decode():
+                    self._put_audio(resampler.resample(frame))
+
+        if resampler is not None and not self._released['audio'].is_set():
+            self._put_audio(resampler.resample(None))
+        logger.info("Demuxed %s in one pass - %d video frames decoded", self.video_path, index)
+
+    def _put_frame(self, item):
+        if self._frames is None:
+            return
+        while not self._released['video'].is_set():
+            try:
+                self._frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _put_audio(self, frames):
+        for frame in frames:
+            self._audio.put(frame.to_ndarray().reshape(-1).astype(np.float32) / 32768.0)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Failed to demux {self.video_path}: {self._error}") from self._error
+
+    def properties(self):
+        """Return (total_frames, fps) as reported by the container, like DEEPFAKE.video_properties."""
+        self._opened.wait()
+        self._raise_error()
+        return self.total_frames, self.fps
+
+    def frames(self, positions):
+        """
+        Yield (frame_index, frame) for the given increasing frame indices as they are demuxed, like
+        DEEPFAKE.iter_video_frames. Frames are BGR. The video stream is released when iteration ends.
+        """
+        self._opened.wait()
+        self._positions = positions
+        self._video_ready.set()
+        extracted = 0
+        try:
+            while self._frames is not None:
+                item = self._frames.get()
+                if item is _END:
+                    break
+                extracted += 1
+                yield item
+            self._raise_error()
+        finally:
+            self.release('video')
+            count('frames_decoded', extracted, pipeline='deepfake')
+
+    def iter_audio(self, chunk_seconds=None):
+        """
+        Yield the audio track as mono float32 PCM at `sample_rate` while it is demuxed.
+        With `chunk_seconds` the pieces are regrouped into chunks of exactly that length (the last one
+        may be shorter). The audio stream is released when iteration ends.
+        """
+        self._opened.wait()
+        self._raise_error()
+        if not self.has_audio:
+            self.release('audio')
+            raise RuntimeError(f"Failed to load audio from {self.video_path}: no audio stream")
+
+        chunk_size = int(chunk_seconds * self.sample_rate) if chunk_seconds else 0
+        pending = []
+        pending_size = 0
+        try:
+            while (pcm := self._audio.get()) is not _END:
+                if not chunk_size:
+                    yield pcm
+                    continue
+                pending.append(pcm)
+                pending_size += len(pcm)
+                if pending_size >= chunk_size:
+                    merged = np.concatenate(pending)
+                    for start in range(0, len(merged) - chunk_size + 1, chunk_size):
+                        yield merged[start:start + chunk_size]
+                    rest = merged[len(merged) - len(merged) % chunk_size:]
+                    pending, pending_size = [rest], len(rest)
+            self._raise_error()
+            if pending_size:
+                yield np.concatenate(pending)
+        finally:
+            self.release('audio')
+
+    def read_audio(self):
+        """
+        The whole audio track as mono float32 PCM at `sample_rate`, like FAKENEWS.load_audio. Only returns
+        once the frame consumer is nearly done, prefer `iter_audio` when both streams are consumed.
+        """
+        pieces = list(self.iter_audio())
+        return np.concatenate(pieces) if pieces else np.empty(0, dtype=np.float32)
+
+    def release(self, stream):
+        """Stop demuxing a stream ('video' or 'audio') that its consumer no longer needs."""
+        self._released[stream].set()
+        if stream == 'video':
+            self._video_ready.set()
+            # Free the frames nobody will read
+            while self._frames is not None:
+                try:
+                    self._frames.get_nowait()
+                except queue.Empty:
+                    break
+
+    def close(self):
+        for stream in STREAMS:
+            self.release(stream)
+        self._thread.join()
+
+
+def open_media(video_path):
+    """
+    Start a single-pass ingest of the video if TRUTHLENS_SINGLE_PASS_INGEST=1 and PyAV is installed,
+    otherwise return None so each pipeline reads the file itself.
+    """
+    if not SINGLE_PASS_INGEST:
+        return None
+    if importlib.util.find_spec('av') is None:
+        logger.warning("TRUTHLENS_SINGLE_PASS_INGEST needs PyAV (pip install av), reading the video twice")
+        return None
+    return MediaIngest(video_path)
@@ -0,0 +1,216 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from instrumentation import count
+
+# Registry limits can be set in the .env file
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide, thread-safe cache of the heavy models used by DEEPFAKE.py and FAKENEWS.py.
+
+    Each model is registered once with a loader function and is only built the first time
+    someone asks for it. Later calls return the same instance for the life of the process,
+    unless it is evicted by the LRU limit or the idle timeout.
+
+    Args:
+    - max_loaded (int or None): Maximum number of models kept in memory at once (LRU eviction).
+    - idle_timeout (float or None): Seconds a model may stay unused before it is evicted.
+    """
+
+    def __init__(self, max_loaded=None, idle_timeout=None):
+        self.max_loaded = max_loaded
+        self.idle_timeout = idle_timeout
+
+        self._loaders = {}
+        self._warm = set()
+        self._models = OrderedDict()  # name -> model, least recently used first
+        self._last_used = {}
+        self._load_locks = {}
+        self._metrics = {}
+        self._lock = threading.RLock()
+
+        self._janitor = None
+        self._janitor_stop = threading.Event()
+
+    def register(self, name, loader, warm=True):
+        """
+        Register a loader for a model. The loader is called without arguments and must return the model.
+        Registering the same name again replaces the loader and drops any loaded instance.
+        Models registered with warm=False (e.g. alternative backends that are not selected) are
+        skipped by warm_up() unless asked for by name.
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            if warm:
+                self._warm.add(name)
+            else:
+                self._warm.discard(name)
+            self._load_locks.setdefault(name, threading.Lock())
+            self._metrics.setdefault(name, {
+                "loads": 0,
+                "hits": 0,
+                "evictions": 0,
+                "last_load_seconds": None,
+                "total_load_seconds": 0.0,
+            })
+            self._models.pop(name, None)
+            self._last_used.pop(name, None)
+
+    def is_registered(self, name):
+        with self._lock:
+            return name in self._loaders
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._models
+
+    def get(self, name):
+        """
+        Return the model registered under `name`, loading it on first use.
+        """
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"No model registered under '{name}'")
+            if name in self._models:
+                return self._touch(name)
+            load_lock = self._load_locks[name]
+
+        # Load outside the registry lock so different models can load in parallel,
+        # while concurrent requests for the same model wait for a single load.
+        with load_lock:
+            with self._lock:
+                if name in self._models:
+                    return self._touch(name)
+                loader = self._loaders[name]
+
+            start = time.perf_counter()
+            model = loader()
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                metrics = self._metrics[name]
+                metrics["loads"] += 1
+                metrics["last_load_seconds"] = elapsed
+                metrics["total_load_seconds"] += elapsed
+                self._models[name] = model
+                self._last_used[name] = time.monotonic()
+                self._evict_lru()
+
+        logger.info("Loaded model '%s' in %.2fs", name, elapsed)
+        count('model_loads', model=name)
+        return model
+
+    def _touch(self, name):
+        self._models.move_to_end(name)
+        self._last_used[name] = time.monotonic()
+        self._metrics[name]["hits"] += 1
+        return self._models[name]
+
+    def _drop(self, name):
+        self._models.pop(name, None)
+        self._last_used.pop(name, None)
+        self._metrics[name]["evictions"] += 1
+        logger.info("Evicted model '%s'", name)
+        count('model_evictions', model=name)
+
+    def _evict_lru(self):
+        if self.max_loaded is None:
+            return
+        while len(self._models) > self.max_loaded:
+            oldest = next(iter(self._models))
+            self._drop(oldest)
+
+    def evict(self, name):
+        """Drop a loaded model so its memory can be reclaimed. It is reloaded on the next get()."""
+        with self._lock:
+            if name in self._models:
+                self._drop(name)
+
+    def evict_idle(self):
+        """Drop every model that has not been used for longer than `idle_timeout` seconds."""
+        if self.idle_timeout is None:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            idle = [name for name, last in self._last_used.items() if now - last > self.idle_timeout]
+            for name in idle:
+                self._drop(name)
+        return idle
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._models):
+                self._drop(name)
+
+    def warm_up(self, names=None):
+        """
+        Load the given models (all models registered with warm=True by default) ahead of the first request.
+        """
+        with self._lock:
+            names = [name for name in self._loaders if name in self._warm] if names is None else list(names)
+        for name in names:
+            self.get(name)
+
+    def warm_up_async(self, names=None):
+        """Run warm_up() in a daemon thread and return the thread."""
+        thread = threading.Thread(target=self.warm_up, args=(names,), name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def start_janitor(self, interval=None):
+        """
+        Start a daemon thread that periodically evicts idle models. Does nothing without an idle timeout.
+        """
+        if self.idle_timeout is None or self._janitor is not None:
+            return
+        interval = interval or max(1.0, self.idle_timeout / 2)
+
+        def run():
+            while not self._janitor_stop.wait(interval):
+                self.evict_idle()
+
+        self._janitor = threading.Thread(target=run, name="model-janitor", daemon=True)
+        self._janitor.start()
+
+    def stop_janitor(self):
+        if self._janitor is not None:
+            self._janitor_stop.set()
+            self._janitor.join()
+            self._janitor = None
+            self._janitor_stop.clear()
+
+    def metrics(self):
+        """
+        Return a snapshot of per-model metrics: number of loads, cache hits, evictions,
+        last/total load time in seconds and whether the model is currently loaded.
+        """
+        with self._lock:
+            snapshot = {}
+            for name, metrics in self._metrics.items():
+                snapshot[name] = dict(metrics, loaded=name in self._models)
+            return snapshot
+
+
+def _env_number(name, cast):
+    value = os.getenv(name)
+    if value in (None, ""):
+        return None
+    return cast(value)
+
+
+# Shared registry used by the whole application
+registry = ModelRegistry(
+    max_loaded=_env_number("TRUTHLENS_MAX_LOADED_MODELS", int),
+    idle_timeout=_env_number("TRUTHLENS_MODEL_IDLE_TIMEOUT", float),
+)
+registry.start_janitor()
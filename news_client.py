@@ -0,0 +1,226 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from instrumentation import count, span
+
+# Load environment variables from .env file
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+NEWSAPI_URL = 'https://newsapi.org/v2/everything'
+# NewsAPI never returns more than 100 articles per page
+MAX_PAGE_SIZE = 100
+
+
+class NewsAPIError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class NewsBackend:
+    """
+    Source of news articles used by NewsClient. Subclasses implement `fetch_page`.
+    """
+
+    def fetch_page(self, query, page, page_size, sort_by):
+        """
+        Return one page of search results as (articles, total_results).
+        Articles are dicts in the NewsAPI format (title, description, content, url, source, ...).
+        """
+        raise NotImplementedError
+
+
+class NewsAPIBackend(NewsBackend):
+    """
+    NewsAPI /v2/everything over a pooled requests.Session, with timeouts and retries.
+
+    Rate limiting (429) and server errors (5xx) are retried after the Retry-After delay the API asks
+    for, or with exponential backoff, waiting at most `max_backoff` seconds. A longer Retry-After (e.g. the
+    daily quota reset) fails the request at once instead of blocking the pipeline.
+    `base_url` can point to a local HTTP stub for tests and benchmarks.
+    """
+
+    def __init__(self, api_key=None, base_url=None, timeout=10, max_retries=3, backoff=1.0, max_backoff=30.0,
+                 pool_size=8):
+        self.api_key = api_key or os.getenv('NEWSAPI_KEY')
+        if not self.api_key:
+            raise ValueError("NEWSAPI_KEY not found in environment variables. Please check your .env file.")
+        self.base_url = base_url or os.getenv('NEWSAPI_BASE_URL') or NEWSAPI_URL
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before the next attempt, or None if the API asks to wait longer than max_backoff."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                pass
+            else:
+                return delay if delay <= self.max_backoff else None
+        return min(self.backoff * 2 ** attempt, self.max_backoff)
+
+    def fetch_page(self, query, page, page_size, sort_by):
+        params = {"q": query, "pageSize": page_size, "page": page, "sortBy": sort_by}
+        headers = {"X-Api-Key": self.api_key}
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.get(self.base_url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code == 200:
+                    data = response.json()
+                    return data.get("articles", []), data.get("totalResults", 0)
+                retryable = response.status_code == 429 or response.status_code >= 500
+                if not retryable or attempt == self.max_retries:
+                    raise NewsAPIError(response.status_code, response.text)
+            delay = self._retry_delay(response, attempt)
+            if delay is None:
+                raise NewsAPIError(response.status_code, response.text)
+            time.sleep(delay)
+
+
+class FixtureBackend(NewsBackend):
+    """
+    Offline stand-in for NewsAPI that serves articles from a JSON file (a list of articles or a NewsAPI
+    response with an "articles" key). An article matches if any query keyword appears in its text.
+    """
+
+    def __init__(self, path_or_articles):
+        if isinstance(path_or_articles, (str, os.PathLike)):
+            with open(path_or_articles, encoding='utf-8') as f:
+                data = json.load(f)
+            path_or_articles = data["articles"] if isinstance(data, dict) else data
+        self.articles = list(path_or_articles)
+
+    def fetch_page(self, query, page, page_size, sort_by):
+        keywords = [keyword.lower() for keyword in query.split(' OR ')]
+        matches = []
+        for article in self.articles:
+            text = " ".join(str(article.get(field) or '') for field in ('title', 'description', 'content')).lower()
+            if any(keyword in text for keyword in keywords):
+                matches.append(article)
+        start = (page - 1) * page_size
+        return matches[start:start + page_size], len(matches)
+
+
+def normalize_query(keywords):
+    """Lowercase, strip and de-duplicate keywords so equivalent queries share a cache entry."""
+    return ' OR '.join(sorted({keyword.strip().lower() for keyword in keywords if keyword.strip()}))
+
+
+class NewsClient:
+    """
+    Article search on top of a NewsBackend, with a TTL cache keyed on the normalized query and
+    concurrent fetching of the pages after the first one.
+
+    Args:
+    - backend (NewsBackend): Where articles come from.
+    - cache_ttl (float): Seconds a cached search result stays valid (0 disables the cache).
+    - cache_size (int): Maximum number of cached searches.
+    - max_workers (int): Pages fetched in parallel.
+    """
+
+    def __init__(self, backend, cache_ttl=900, cache_size=256, max_workers=4):
+        self.backend = backend
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='news')
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "requests": 0}
+
+    def _fetch(self, query, page, page_size, sort_by):
+        with self._lock:
+            self.stats["requests"] += 1
+        with span('news_page_fetch'):
+            return self.backend.fetch_page(query, page, page_size, sort_by)
+
+    def search(self, keywords, max_results=20, sort_by="relevance"):
+        """
+        Return up to `max_results` articles matching any of the keywords, or None if there are none.
+        """
+        query = normalize_query(keywords)
+        key = (query, max_results, sort_by)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.cache_ttl:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                count('news_search_cache_hits')
+                return entry[1]
+            self.stats["misses"] += 1
+
+        page_size = min(MAX_PAGE_SIZE, max_results)
+        try:
+            articles, total_results = self._fetch(query, 1, page_size, sort_by)
+        except NewsAPIError as e:
+            logger.error("Error fetching articles: %s", e)
+            return None
+
+        # The first page tells how many results exist, the other pages are fetched in parallel
+        pages = math.ceil(min(total_results, max_results) / page_size)
+        if len(articles) == page_size and pages > 1:
+            futures = [self._executor.submit(self._fetch, query, page, page_size, sort_by)
+                       for page in range(2, pages + 1)]
+            for future in futures:
+                try:
+                    page_articles, _ = future.result()
+                except NewsAPIError as e:
+                    logger.error("Error fetching articles: %s", e)
+                    break
+                articles.extend(page_articles)
+                if len(page_articles) < page_size:  # No more articles on next pages
+                    break
+
+        articles = articles[:max_results] if articles else None
+
+        if self.cache_ttl > 0:
+            with self._lock:
+                self._cache[key] = (time.monotonic(), articles)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return articles
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def default_news_client():
+    """
+    Return the application-wide NewsClient. It serves articles from the JSON file in TRUTHLENS_NEWS_FIXTURE
+    if set, otherwise from NewsAPI (or the stub at NEWSAPI_BASE_URL).
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            fixture = os.getenv('TRUTHLENS_NEWS_FIXTURE')
+            backend = FixtureBackend(fixture) if fixture else NewsAPIBackend()
+            _default_client = NewsClient(backend, cache_ttl=float(os.getenv('TRUTHLENS_NEWS_CACHE_TTL', '900')))
+        return _default_client
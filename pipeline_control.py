@@ -0,0 +1,43 @@
+import threading
+
+
+class JobCancelled(Exception):
+    """Raised inside a pipeline when its job has been cancelled."""
+
+
+class JobControl:
+    """
+    Progress reporting and cancellation handle passed to `prediction` and `fake_news_detection`.
+
+    The pipelines call `stage()` before each stage and `check()` inside long loops. Once `cancel()` has
+    been called, the next of these calls raises JobCancelled so the pipeline stops early.
+
+    Args:
+    - progress (callable): Called as progress(stage, message) at the start of each stage.
+    """
+
+    def __init__(self, progress=None):
+        self._progress = progress
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def stage(self, name, message=""):
+        self.check()
+        if self._progress is not None:
+            self._progress(name, message)
+
+    def watch(self, items):
+        """Iterate over `items`, checking for cancellation before each one."""
+        for item in items:
+            self.check()
+            yield item
@@ -0,0 +1,277 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+from instrumentation import count, span
+
+# Cache settings can be set in the .env file
+load_dotenv()
+
+# Returned by ResultCache.get() when a key is not cached (None is a valid cached value)
+MISSING = object()
+
+_CHUNK_SIZE = 1 << 20
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    """
+    Return a BLAKE2b hex digest of a file's content.
+    Digests are remembered per (path, size, mtime) so a file is only read once per process.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if memo_key in _digests:
+            return _digests[memo_key]
+
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    digest = digest.hexdigest()
+
+    with _digests_lock:
+        _digests[memo_key] = digest
+    return digest
+
+
+def _hash_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache for pipeline artifacts (face crops, features, transcripts, verdicts, ...).
+
+    Values are stored as .npy (arrays), .npz (lists of arrays) or .json (anything JSON serialisable).
+    The least recently used entries are deleted once the cache grows over `max_bytes`.
+
+    Args:
+    - directory (str): Where the cache files live.
+    - max_bytes (int): Size limit of the cache on disk.
+    """
+
+    def __init__(self, directory, max_bytes=2 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "stages": {}}
+
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(os.path.getsize(path) for path in self._entry_paths())
+
+    def _entry_paths(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.tmp'):
+                    yield os.path.join(root, name)
+
+    def _base_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _find(self, key):
+        base = self._base_path(key)
+        for extension in ('.npy', '.npz', '.json'):
+            if os.path.exists(base + extension):
+                return base + extension
+        return None
+
+    def _count(self, stage, outcome):
+        self._stats[outcome] += 1
+        if stage is not None:
+            stage_stats = self._stats["stages"].setdefault(stage, {"hits": 0, "misses": 0})
+            stage_stats[outcome] += 1
+        count(f"cache_{outcome}", stage=stage)
+
+    def get(self, key, stage=None):
+        """Return the cached value for `key`, or MISSING."""
+        with self._lock:
+            path = self._find(key)
+            if path is None:
+                self._count(stage, "misses")
+                return MISSING
+            try:
+                if path.endswith('.npy'):
+                    value = np.load(path, allow_pickle=False)
+                elif path.endswith('.npz'):
+                    with np.load(path, allow_pickle=False) as data:
+                        value = [data[f"arr_{i}"] for i in range(len(data.files))]
+                else:
+                    with open(path, encoding='utf-8') as f:
+                        value = json.load(f)
+            except (OSError, ValueError):
+                # Corrupt or half-deleted entry: treat it as a miss
+                self._count(stage, "misses")
+                return MISSING
+
+            # Mark as recently used; another process may have evicted it since, the value is still good
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            self._count(stage, "hits")
+            return value
+
+    def put(self, key, value):
+        """Store `value` under `key` and evict old entries if the cache is over its size limit."""
+        base = self._base_path(key)
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+
+        if isinstance(value, np.ndarray):
+            path = base + '.npy'
+            write = lambda f: np.save(f, value, allow_pickle=False)
+        elif isinstance(value, list) and value and all(isinstance(item, np.ndarray) for item in value):
+            path = base + '.npz'
+            write = lambda f: np.savez(f, *value)
+        else:
+            path = base + '.json'
+            write = lambda f: f.write(json.dumps(value).encode('utf-8'))
+
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        size = os.path.getsize(tmp_path)
+
+        with self._lock:
+            old_path = self._find(key)
+            if old_path is not None:
+                self._total_bytes -= os.path.getsize(old_path)
+                os.remove(old_path)
+            os.replace(tmp_path, path)
+            self._total_bytes += size
+            self._stats["writes"] += 1
+            self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        entries = []
+        for path in self._entry_paths():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        for _, size, path in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            for path in list(self._entry_paths()):
+                os.remove(path)
+            self._total_bytes = 0
+
+    def stats(self):
+        """Hit/miss/write/eviction counters (overall and per stage) and the current size on disk."""
+        with self._lock:
+            stats = json.loads(json.dumps(self._stats))
+            stats["bytes"] = self._total_bytes
+            stats["max_bytes"] = self.max_bytes
+            return stats
+
+
+class Stage:
+    """
+    One step of a pipeline whose output is cached under a key derived from its inputs.
+
+    The key combines the parent stage keys, the stage name, its version and its config, so it can be
+    computed without running anything. `value()` returns the cached output if there is one and only
+    runs `compute` (which usually calls `value()` on its parents) on a miss. A repeated video therefore
+    skips straight to the first stage whose inputs changed. A None output is never cached.
+    """
+
+    def __init__(self, cache, key, name, compute, parents=(), control=None, pipeline=None):
+        self.cache = cache
+        self.key = key
+        self.name = name
+        self.pipeline = pipeline
+        self.parents = parents
+        self.control = control
+        self._compute = compute
+        self._value = MISSING
+
+    def value(self):
+        if self._value is MISSING:
+            if self.cache is not None:
+                self._value = self.cache.get(self.key, stage=self.name)
+            if self._value is not MISSING:
+                if self.control is not None:
+                    self.control.stage(self.name, "cached")
+            else:
+                # Resolve the inputs first so progress is reported in execution order
+                for parent in self.parents:
+                    parent.value()
+                if self.control is not None:
+                    self.control.stage(self.name)
+                with span(self.name, pipeline=self.pipeline):
+                    self._value = self._compute()
+                # None stands for a failed or empty result (e.g. a NewsAPI error), so it is tried again next run
+                if self.cache is not None and self._value is not None:
+                    self.cache.put(self.key, self._value)
+        return self._value
+
+
+class StageChain:
+    """
+    Builds the cached stages of one pipeline run on one video. With `cache=None` nothing is hashed
+    or stored and every stage simply runs its computation once.
+    An optional JobControl is told when each stage starts and can cancel the run between stages.
+    Every computed stage is timed with an instrumentation span named after it.
+    """
+
+    def __init__(self, cache, video_path, pipeline, control=None):
+        self.cache = cache
+        self.control = control
+        self.pipeline = pipeline
+        self.root_key = None if cache is None else _hash_key(file_digest(video_path), pipeline)
+
+    def stage(self, name, compute, parents=(), version=1, **config):
+        """
+        Declare a stage.
+        :param name: Stage name, used for stats and progress.
+        :param compute: Function without arguments returning the stage output.
+        :param parents: Stages whose output this stage consumes (the video itself is always an input).
+        :param version: Bump when the code of the stage changes in a way that changes its output.
+        :param config: Settings and model versions that affect the output.
+        """
+        key = None
+        if self.cache is not None:
+            parent_keys = [parent.key for parent in parents] or [self.root_key]
+            key = _hash_key(parent_keys, name, version, config)
+        return Stage(self.cache, key, name, compute, parents, self.control, self.pipeline)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def default_cache():
+    """
+    Return the application-wide cache, configured by TRUTHLENS_CACHE, TRUTHLENS_CACHE_DIR and
+    TRUTHLENS_CACHE_MAX_MB, or None if caching is disabled.
+    """
+    global _default_cache
+    if os.getenv('TRUTHLENS_CACHE', '1') == '0':
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            directory = os.getenv('TRUTHLENS_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'truthlens')
+            max_bytes = int(float(os.getenv('TRUTHLENS_CACHE_MAX_MB', '2048')) * (1 << 20))
+            _default_cache = ResultCache(directory, max_bytes)
+        return _default_cache
@@ -1,8 +1,7 @@
 from PyQt6.QtWidgets import QPushButton, QVBoxLayout, QWidget, QLabel, QScrollArea
 from PyQt6.QtGui import QPixmap, QPalette, QBrush
 
-from DEEPFAKE import prediction
-from FAKENEWS import fake_news_detection
+from job_runner import AnalysisJob
 
 from PyQt6.QtCore import Qt
 
@@ -14,6 +13,7 @@ class SecondScreen(QWidget):
         self.stacked_widget = stacked_widget
 
         self.video_path = None
+        self.job = None
 
         # Set background pic
         self.setAutoFillBackground(True)
@@ -41,6 +41,25 @@ class SecondScreen(QWidget):
                 """)
         layout.addWidget(self.title_label)
 
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("""
+                    QLabel {
+                        font-size: 13px;
+                        color: white;
+                    }
+                """)
+        layout.addWidget(self.status_label)
+
+        # Live counters and stage timings of the running job
+        self.metrics_label = QLabel("")
+        self.metrics_label.setStyleSheet("""
+                    QLabel {
+                        font-size: 12px;
+                        color: #aaaaaa;
+                    }
+                """)
+        layout.addWidget(self.metrics_label)
+
         self.deepfake_label = QLabel("DeepFake Frames Analysis Result")
         layout.addWidget(self.deepfake_label)
         self.deepfake_label.setStyleSheet("""
@@ -116,14 +135,92 @@ class SecondScreen(QWidget):
         main_layout = QVBoxLayout(self)
         main_layout.addWidget(scroll_area)
 
+    # Human-readable names of the pipeline stages, shown while a job runs
+    STAGE_LABELS = {
+        "faces": "Detecting faces",
+        "features": "Extracting face features",
+        "verdict": "Classifying frames",
+        "transcript": "Transcribing audio",
+        "keywords": "Extracting keywords",
+        "articles": "Fetching news articles",
+        "transcript_summary": "Summarizing the video",
+        "article_embeddings": "Comparing articles",
+        "result": "Summarizing the best articles",
+        "remote": "Waiting for the inference server",
+    }
+
+    # Instrumentation counters shown while a job runs
+    COUNTER_LABELS = {
+        "frames_decoded": "frames decoded",
+        "faces_found": "faces found",
+        "articles_fetched": "articles fetched",
+    }
+
     def go_to_main_screen(self):
+        # Stop the running analysis, its results are no longer needed
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
         self.stacked_widget.setCurrentIndex(0)
 
     def start_prediction(self, video_path):
         self.video_path = video_path
 
+        if self.job is not None:
+            self.job.cancel()
+
+        self.label.setText("Analyzing frames...")
+        self.text_label.setText("Analyzing audio...")
+        self.articles_label.setText("")
+        self.status_label.setText("")
+        self.metrics_label.setText("")
+        self.job_counters = {}
+        self.stage_seconds = {}
+
+        # Imported here so numpy is not loaded before the window is shown
+        from result_cache import default_cache
+
+        # Both analyses run in parallel off the GUI thread, each result is shown as soon as it is ready
+        self.job = AnalysisJob(video_path, cache=default_cache())
+        self.job.signals.progress.connect(self.show_progress)
+        self.job.signals.event.connect(self.show_event)
+        self.job.signals.deepfake_ready.connect(self.show_deepfake_result)
+        self.job.signals.news_ready.connect(self.show_news_result)
+        self.job.signals.failed.connect(self.show_error)
+        self.job.signals.finished.connect(self.analysis_finished)
+        self.job.start()
+
+    def show_progress(self, pipeline, stage, message):
+        text = self.STAGE_LABELS.get(stage, stage)
+        if message:
+            text += f" ({message})"
+        self.status_label.setText(text + "...")
+
+    def show_event(self, event):
+        if event["kind"] == "counter" and event["name"] in self.COUNTER_LABELS:
+            self.job_counters[event["name"]] = self.job_counters.get(event["name"], 0) + event["value"]
+        elif event["kind"] == "span" and event["name"] in self.STAGE_LABELS:
+            self.stage_seconds[event["name"]] = event["duration"]
+        else:
+            return
+
+        parts = [f"{value} {self.COUNTER_LABELS[name]}" for name, value in self.job_counters.items()]
+        parts += [f"{self.STAGE_LABELS[name].lower()}: {seconds:.1f}s" for name, seconds in self.stage_seconds.items()]
+        self.metrics_label.setText(" | ".join(parts))
+
+    def show_error(self, pipeline, error):
+        if pipeline == "deepfake":
+            self.label.setText(f"The frames analysis failed: {error}")
+        else:
+            self.text_label.setText("")
+            self.articles_label.setText(f"The news analysis failed: {error}")
+
+    def analysis_finished(self):
+        self.status_label.setText("Analysis complete.")
+        self.job = None
+
+    def show_deepfake_result(self, prediction_score):
         #DEEPFAKE FRAMES
-        prediction_score = prediction(self.video_path)
         pred = (prediction_score > 0.5).astype(int)
 
         if pred == 0:
@@ -131,16 +228,15 @@ class SecondScreen(QWidget):
         elif pred == 1:
             self.label.setText("The video is deepfaked !")
 
-
+    def show_news_result(self, summarized_articles):
         #FAKE NEWS
-        summarized_articles = fake_news_detection(video_path)
-
         if summarized_articles:
             self.text_label.setText("Here are 5 articles most similar to the content of your video :")
             articles_text = ""
             for article in summarized_articles:
                 source_name = article['source'].get('name', 'Unknown Source')  # Use 'Unknown Source' as fallback
                 article_text = f"<b>Title:</b> {article['title']}<br>" \
+                               f"<b>Similarity:</b> {article.get('similarity', 0) * 100:.1f}%<br>" \
                                f"<b>Summary:</b> {article['summary']}<br>" \
                                f"<b>Source:</b> {source_name}<br>" \
                                f"<b>URL:</b> <a href='{article['url']}'>{article['url']}</a><br><br>"
@@ -149,4 +245,5 @@ class SecondScreen(QWidget):
 
             self.articles_label.setText(articles_text)
         else:
+            self.text_label.setText("")
             self.articles_label.setText("No summarized articles were found.")
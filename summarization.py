@@ -0,0 +1,138 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from model_registry import registry
+from result_cache import MISSING
+
+# Summarizer backend can be set in the .env file
+load_dotenv()
+
+# "bart" (facebook/bart-large-cnn), "distilbart" (sshleifer/distilbart-cnn-12-6, about twice as fast)
+# or "extractive" (picks the most central sentences with the Sentence-BERT model, no generation)
+SUMMARIZER_BACKEND = os.getenv('TRUTHLENS_SUMMARIZER', 'bart')
+# The Sentence-BERT model of the extractive backend, see FAKENEWS.EMBEDDING_MODEL
+EMBEDDING_MODEL = os.getenv('TRUTHLENS_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+
+ABSTRACTIVE_MODELS = {
+    "bart": "facebook/bart-large-cnn",
+    "distilbart": "sshleifer/distilbart-cnn-12-6",
+}
+
+
+def _load_summarizer(model_name):
+    # transformers is imported on first use, it takes seconds to import
+    from transformers import pipeline
+    return pipeline("summarization", model=model_name)
+
+# Only the selected backend is loaded by registry.warm_up()
+for _backend, _model_name in ABSTRACTIVE_MODELS.items():
+    registry.register(f'{_backend}_summarizer', lambda model_name=_model_name: _load_summarizer(model_name),
+                      warm=_backend == SUMMARIZER_BACKEND)
+
+# Summaries already computed in this process, keyed by backend, lengths and text hash
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_MEMORY_SIZE = 1024
+
+
+def _summary_key(backend, text, max_length, min_length):
+    if backend == "extractive" and EMBEDDING_MODEL != 'all-MiniLM-L6-v2':
+        # Another embedding model picks other sentences, the default keeps existing entries valid
+        backend = f"extractive-{EMBEDDING_MODEL.replace('/', '_')}"
+    text_hash = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+    return f"summary-{backend}-{max_length}-{min_length}-{text_hash}"
+
+
+def _split_sentences(text):
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', text.strip()) if sentence]
+
+
+def extractive_summary(text, max_length):
+    """
+    Summarize without generation: keep the sentences closest to the centroid of all sentence
+    embeddings, in their original order, within a budget of about `max_length` words.
+    """
+    sentences = _split_sentences(text)
+    if len(sentences) <= 1:
+        return text.strip()
+
+    model = registry.get('sentence_model')
+    embeddings = model.encode(sentences, normalize_embeddings=True, convert_to_numpy=True)
+    centroid = embeddings.mean(axis=0)
+    scores = embeddings @ centroid
+
+    chosen = []
+    words = 0
+    for idx in np.argsort(-scores):
+        length = len(sentences[idx].split())
+        if chosen and words + length > max_length:
+            continue
+        chosen.append(idx)
+        words += length
+        if words >= max_length:
+            break
+
+    return " ".join(sentences[idx] for idx in sorted(chosen))
+
+
+def summarize(texts, max_length, min_length, backend=None, cache=None):
+    """
+    Summarize several texts at once.
+
+    All texts that are not cached yet go through the summarizer in a single padded batch. Summaries are
+    cached by content hash in memory and, if `cache` (a ResultCache) is given, on disk, so an article
+    that shows up again costs nothing.
+
+    :param texts: List of texts to summarize.
+    :param max_length: Maximum summary length (tokens for abstractive backends, words for extractive).
+    :param min_length: Minimum summary length (abstractive backends only).
+    :param backend: "bart", "distilbart" or "extractive" (TRUTHLENS_SUMMARIZER by default).
+    :param cache: Optional ResultCache for summaries shared across processes and runs.
+    :return: List of summaries, in the order of `texts`.
+    """
+    backend = backend or SUMMARIZER_BACKEND
+    if backend != "extractive" and backend not in ABSTRACTIVE_MODELS:
+        raise ValueError(f"Unknown summarizer backend '{backend}'")
+
+    keys = [_summary_key(backend, text, max_length, min_length) for text in texts]
+    summaries = [None] * len(texts)
+    missing = []
+
+    for i, key in enumerate(keys):
+        with _memory_lock:
+            summary = _memory.get(key)
+            if summary is not None:
+                _memory.move_to_end(key)
+        if summary is None and cache is not None:
+            cached = cache.get(key, stage='summary')
+            summary = None if cached is MISSING else cached
+        if summary is None:
+            missing.append(i)
+        summaries[i] = summary
+
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        if backend == "extractive":
+            new_summaries = [extractive_summary(text, max_length) for text in missing_texts]
+        else:
+            summarizer = registry.get(f'{backend}_summarizer')
+            results = summarizer(missing_texts, max_length=max_length, min_length=min_length, do_sample=False,
+                                 truncation=True, batch_size=len(missing_texts))
+            new_summaries = [result['summary_text'] for result in results]
+
+        for i, summary in zip(missing, new_summaries):
+            summaries[i] = summary
+            if cache is not None:
+                cache.put(keys[i], summary)
+            with _memory_lock:
+                _memory[keys[i]] = summary
+                while len(_memory) > _MEMORY_SIZE:
+                    _memory.popitem(last=False)
+
+    return summaries
@@ -0,0 +1,66 @@
+"""
+Resuming a batch scan whose output file ends in a record cut short by the interruption.
+
+Usage:
+    python -m pytest tests
+"""
+import csv
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import batch_scan
+
+
+def record(path):
+    return {"path": path, "status": "ok", "verdict": "REAL", "fake_probability": 0.1,
+            "articles": [{"title": "A \"quoted\" title,\nover two lines", "score": 0.5}], "timeline": None,
+            "timings": {"deepfake": 1.0}, "counters": {}, "total_seconds": 1.0, "error": None}
+
+
+def write_records(output_path, paths):
+    writer = batch_scan.ResultWriter(str(output_path))
+    for path in paths:
+        writer.write(record(path))
+    writer.close()
+
+
+def cut_inside_articles(output_path, path):
+    """Truncate the file in the middle of the quoted articles field of the record of `path`."""
+    data = output_path.read_bytes()
+    start = data.index(path.encode())
+    output_path.write_bytes(data[:data.index(b"over two", start)])
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".jsonl"])
+def test_resume_after_a_record_cut_inside_a_quoted_field(tmp_path, suffix):
+    output_path = tmp_path / f"results{suffix}"
+    write_records(output_path, ["a.mp4", "b.mp4", "c.mp4"])
+    cut_inside_articles(output_path, "c.mp4")
+
+    assert batch_scan.read_recorded(str(output_path)) == {"a.mp4", "b.mp4"}
+
+    # The rerun scans c.mp4 again and every record it writes is read back
+    write_records(output_path, ["c.mp4", "d.mp4"])
+    assert batch_scan.read_recorded(str(output_path)) == {"a.mp4", "b.mp4", "c.mp4", "d.mp4"}
+    with open(output_path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f)) if suffix == ".csv" else [json.loads(line) for line in f]
+    assert [row["path"] for row in rows] == ["a.mp4", "b.mp4", "c.mp4", "d.mp4"]
+    for row in rows:
+        articles = json.loads(row["articles"]) if suffix == ".csv" else row["articles"]
+        assert articles == record(row["path"])["articles"]
+
+
+def test_resume_after_a_csv_row_cut_inside_its_last_field(tmp_path):
+    output_path = tmp_path / "results.csv"
+    write_records(output_path, ["a.mp4"])
+    writer = batch_scan.ResultWriter(str(output_path))
+    writer.write(dict(record("b.mp4"), status="error", error="Traceback (most recent call last)"))
+    writer.close()
+    output_path.write_bytes(output_path.read_bytes()[:-len(b"call last)\r\n")])
+
+    assert batch_scan.read_recorded(str(output_path)) == {"a.mp4"}
@@ -0,0 +1,105 @@
+"""
+Memory-bounded mode: features go into one preallocated buffer and face sampling stops at the faces the LSTM sees.
+
+MTCNN and ResNet50 are replaced by stubs, so these tests load no model. Peak memory is measured with
+tracemalloc, which sees the NumPy buffers.
+
+Usage:
+    python -m pytest tests
+"""
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("dotenv")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import DEEPFAKE
+
+MAX_LENGTH = 108
+# 108 crops at 224x224 (16 MB), one preprocessed ResNet batch of 32 (19 MB) and a few 720p frames
+PEAK_LIMIT = 48 * 2**20
+
+
+def stub_extractor(batches):
+    """Feature extractor returning ones, recording the size of every batch it is given."""
+    def extract(batch):
+        batches.append(len(batch))
+        return np.ones((len(batch), DEEPFAKE.FEATURE_DIM), dtype=np.float32)
+    return extract
+
+
+@pytest.mark.parametrize("dtype", [np.float16, np.float32])
+@pytest.mark.parametrize("face_count", [40, 150])
+def test_feature_extraction_fills_a_padded_buffer(dtype, face_count):
+    faces = [np.zeros((32, 32, 3), dtype=np.uint8) for _ in range(face_count)]
+    batches = []
+
+    features = DEEPFAKE.feature_extraction(faces, extractor=stub_extractor(batches), max_length=MAX_LENGTH,
+                                           dtype=dtype)
+
+    assert features.shape == (1, MAX_LENGTH, DEEPFAKE.FEATURE_DIM)
+    assert features.dtype == dtype
+    kept = min(face_count, MAX_LENGTH)
+    # Faces beyond max_length never reach the extractor
+    assert sum(batches) == kept
+    assert np.all(features[0, :kept] == 1)
+    assert np.all(features[0, kept:] == 0)
+
+
+def test_face_sampling_stops_reading_frames_at_max_faces(monkeypatch):
+    monkeypatch.setattr(DEEPFAKE, "detect_best_face", lambda frame, detect_dimension=None: (8, 8, 32, 32))
+    consumed = 0
+
+    def frames():
+        nonlocal consumed
+        for _ in range(3 * MAX_LENGTH):
+            consumed += 1
+            yield np.zeros((64, 64, 3), dtype=np.uint8)
+
+    faces = DEEPFAKE.extract_highest_confidence_face_from_frames(frames(), max_faces=MAX_LENGTH, crop_size=224)
+
+    assert consumed == MAX_LENGTH
+    assert len(faces) == MAX_LENGTH
+    assert all(face.shape == (224, 224, 3) for face in faces)
+
+
+def bounded_peak(monkeypatch, frame_count):
+    """
+    Sample the faces of a synthetic stream of `frame_count` 720p frames and extract their features in
+    memory-bounded mode, returning the peak of the traced allocations.
+    """
+    def synthetic_frames(video_path, frame_interval=15, **sampling):
+        for i in range(frame_count):
+            yield i * frame_interval, np.zeros((720, 1280, 3), dtype=np.uint8)
+
+    monkeypatch.setattr(DEEPFAKE, "iter_video_frames", synthetic_frames)
+    tracemalloc.start()
+    try:
+        faces = DEEPFAKE.sample_faces("synthetic.mp4", DEEPFAKE.JobControl(), mode="interval",
+                                      max_faces=MAX_LENGTH, crop_size=DEEPFAKE.RESNET_INPUT_SIZE)
+        features = DEEPFAKE.feature_extraction(faces, extractor=stub_extractor([]), max_length=MAX_LENGTH,
+                                               dtype=np.float16)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert features.shape == (1, MAX_LENGTH, DEEPFAKE.FEATURE_DIM)
+    return peak
+
+
+def test_peak_memory_does_not_grow_with_video_length(monkeypatch):
+    monkeypatch.setattr(DEEPFAKE, "detect_best_face", lambda frame, detect_dimension=None: (400, 100, 300, 300))
+    monkeypatch.setattr(DEEPFAKE, "DETECTION_WORKERS", 1)
+    monkeypatch.setattr(DEEPFAKE, "KEYFRAME_INTERVAL", 0)
+
+    short_peak = bounded_peak(monkeypatch, 100)
+    long_peak = bounded_peak(monkeypatch, 1000)
+
+    assert short_peak < PEAK_LIMIT
+    assert long_peak < PEAK_LIMIT
+    assert long_peak < 1.25 * short_peak
@@ -0,0 +1,268 @@
+"""
+Optimized CPU inference for the deepfake models with TensorFlow Lite.
+
+`export` converts the ResNet50 feature extractor and the LSTM classifier (my_model.keras) to TFLite,
+optionally quantized, next to a manifest recording how they were built. With
+TRUTHLENS_INFERENCE_BACKEND=tflite, DEEPFAKE.py loads these artifacts through `load_artifact` instead of
+the Keras models. Loading uses the small `tflite_runtime` package when it is installed, so the Keras
+stack is not imported for inference (TensorFlow is only needed to export, and by MTCNN).
+
+`check` compares the features and verdicts of both backends on the faces of a video.
+
+Usage:
+    python tflite_backend.py export --quantization dynamic
+    python tflite_backend.py export --quantization int8 --calibration-video fake_test_video.mp4
+    python tflite_backend.py check --video fake_test_video.mp4
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Artifact directory can be set in the .env file
+load_dotenv()
+
+ARTIFACT_DIR = os.getenv('TRUTHLENS_TFLITE_DIR', 'optimized_models')
+ARTIFACTS = ('resnet50_features', 'deepfake_classifier')
+QUANTIZATIONS = ('none', 'dynamic', 'float16', 'int8')
+MANIFEST = 'manifest.json'
+
+logger = logging.getLogger(__name__)
+
+
+def _interpreter_class():
+    """The TFLite interpreter from tflite_runtime if installed, otherwise from TensorFlow."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter
+
+
+class TFLiteModel:
+    """
+    A converted model with one input and one output, called like a Keras model: `model(batch)` returns
+    the output array. The batch dimension is resized as needed. Calls are serialized because a TFLite
+    interpreter is not thread-safe.
+    """
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self._interpreter = _interpreter_class()(model_path=path, num_threads=num_threads or os.cpu_count())
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs, training=False):
+        inputs = np.ascontiguousarray(inputs, dtype=np.float32)
+        with self._lock:
+            if inputs.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input['index'], inputs.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = inputs.shape[0]
+            self._interpreter.set_tensor(self._input['index'], inputs)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output['index']).copy()
+
+
+def read_manifest(directory=None):
+    path = os.path.join(directory or ARTIFACT_DIR, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def artifact_version(name, directory=None):
+    """Identifies an exported artifact in cache keys, e.g. 'tflite-dynamic-<classifier digest>'."""
+    manifest = read_manifest(directory) or {}
+    entry = manifest.get(name, {})
+    return f"tflite-{entry.get('quantization')}-{entry.get('source', '')}"
+
+
+def load_artifact(name, directory=None):
+    """
+    Load an exported model ('resnet50_features' or 'deepfake_classifier').
+    Raises FileNotFoundError if it has not been exported yet.
+    """
+    directory = directory or ARTIFACT_DIR
+    path = os.path.join(directory, f"{name}.tflite")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No TFLite model at {path}, run `python tflite_backend.py export` first")
+
+    if name == 'deepfake_classifier':
+        from DEEPFAKE import classifier_version
+        exported_from = (read_manifest(directory) or {}).get(name, {}).get('source')
+        if exported_from != classifier_version():
+            logger.warning("%s was exported from another version of the classifier, export it again", path)
+    return TFLiteModel(path)
+
+
+def _calibration_batches(video_path, count=64):
+    """Preprocessed faces from a video, for int8 calibration."""
+    import DEEPFAKE
+    from pipeline_control import JobControl
+
+    faces = DEEPFAKE.sample_faces(video_path, JobControl(), 'adaptive')[:count]
+    if not faces:
+        raise ValueError(f"No faces found in {video_path} to calibrate with")
+    batch = DEEPFAKE.preprocess_faces(faces)
+    return [batch[i:i + 1] for i in range(len(batch))]
+
+
+def _convert(converter, quantization, representative_batches=None):
+    import tensorflow as tf
+
+    if quantization == 'dynamic':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantization == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        # Integer kernels inside, float input and output so callers do not change
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([batch] for batch in representative_batches)
+    return converter.convert()
+
+
+def export(directory=None, quantization='dynamic', calibration_video=None):
+    """
+    Convert both deepfake models to TFLite and write them with a manifest to `directory`.
+
+    :param quantization: 'none', 'dynamic' (int8 weights), 'float16' (float16 weights) or 'int8'
+                         (int8 weights and activations for ResNet50, calibrated on `calibration_video`).
+    :return: Dict of artifact name to file path.
+    """
+    import tensorflow as tf
+    import DEEPFAKE
+
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+    if quantization == 'int8' and calibration_video is None:
+        raise ValueError("int8 quantization needs a calibration video")
+
+    directory = directory or ARTIFACT_DIR
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+    paths = {}
+
+    resnet = DEEPFAKE._load_feature_extractor()
+    calibration = _calibration_batches(calibration_video) if quantization == 'int8' else None
+    models = {'resnet50_features': (tf.lite.TFLiteConverter.from_keras_model(resnet), quantization, calibration)}
+
+    classifier = DEEPFAKE._load_classifier()
+    run = tf.function(lambda x: classifier(x, training=False))
+    signature = tf.TensorSpec([None, DEEPFAKE.MAX_SEQUENCE_LENGTH, DEEPFAKE.FEATURE_DIM], tf.float32)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([run.get_concrete_function(signature)], classifier)
+    # Activations of the LSTM are not calibrated, so it gets int8 weights only
+    models['deepfake_classifier'] = (converter, 'dynamic' if quantization == 'int8' else quantization, None)
+
+    for name, (converter, mode, batches) in models.items():
+        try:
+            flatbuffer = _convert(converter, mode, batches)
+        except Exception as e:
+            # Some LSTM variants only convert with TensorFlow kernels, which need the flex delegate
+            logger.warning("Converting %s with TFLite builtins failed (%s), retrying with TF ops", name, e)
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+            converter._experimental_lower_tensor_list_ops = False
+            flatbuffer = _convert(converter, mode, batches)
+
+        path = os.path.join(directory, f"{name}.tflite")
+        with open(path, 'wb') as f:
+            f.write(flatbuffer)
+        paths[name] = path
+        manifest[name] = {
+            "quantization": mode,
+            "bytes": len(flatbuffer),
+            "source": DEEPFAKE.classifier_version() if name == 'deepfake_classifier' else 'resnet50-imagenet-avg',
+            "tensorflow": tf.__version__,
+        }
+        logger.info("Wrote %s (%s, %.1f MB)", path, mode, len(flatbuffer) / 2**20)
+
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return paths
+
+
+def check_parity(video_path, directory=None, feature_tolerance=0.98, probability_tolerance=0.05):
+    """
+    Compare the Keras and TFLite outputs on the faces of a video.
+
+    Features must keep a mean cosine similarity of at least `feature_tolerance` and fake probabilities
+    may differ by at most `probability_tolerance`, on the full face sequence and on its halves.
+
+    :return: (passed, report) where report holds the measured differences.
+    """
+    import DEEPFAKE
+    from pipeline_control import JobControl
+
+    faces = DEEPFAKE.sample_faces(video_path, JobControl(), 'adaptive')
+    if not faces:
+        raise ValueError(f"No faces found in {video_path}")
+    batch = DEEPFAKE.preprocess_faces(faces)
+
+    keras_resnet = DEEPFAKE._load_feature_extractor()
+    tflite_resnet = load_artifact('resnet50_features', directory)
+    keras_features = np.concatenate([np.asarray(keras_resnet(batch[i:i + 32], training=False))
+                                     for i in range(0, len(batch), 32)])
+    tflite_features = np.concatenate([tflite_resnet(batch[i:i + 32]) for i in range(0, len(batch), 32)])
+    cosine = np.sum(keras_features * tflite_features, axis=1) / (
+        np.linalg.norm(keras_features, axis=1) * np.linalg.norm(tflite_features, axis=1) + 1e-12)
+
+    keras_classifier = DEEPFAKE._load_classifier()
+    tflite_classifier = load_artifact('deepfake_classifier', directory)
+    half = len(keras_features) // 2
+    sequences = [keras_features, keras_features[:half], keras_features[half:]]
+    sequences = np.concatenate([DEEPFAKE.pad_features(s[np.newaxis]) for s in sequences if len(s)])
+    keras_probabilities = np.asarray(keras_classifier(sequences, training=False)).ravel()
+    tflite_probabilities = tflite_classifier(sequences).ravel()
+    probability_diff = np.abs(keras_probabilities - tflite_probabilities)
+
+    report = {
+        "faces": len(faces),
+        "feature_cosine_mean": float(cosine.mean()),
+        "feature_cosine_min": float(cosine.min()),
+        "feature_max_abs_diff": float(np.max(np.abs(keras_features - tflite_features))),
+        "keras_probabilities": keras_probabilities.round(4).tolist(),
+        "tflite_probabilities": tflite_probabilities.round(4).tolist(),
+        "probability_max_diff": float(probability_diff.max()),
+        "same_verdicts": bool(np.all((keras_probabilities > 0.5) == (tflite_probabilities > 0.5))),
+    }
+    passed = (report["feature_cosine_mean"] >= feature_tolerance
+              and report["probability_max_diff"] <= probability_tolerance and report["same_verdicts"])
+    return passed, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=None, help=f"Artifact directory (default: {ARTIFACT_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Convert the Keras models to TFLite")
+    export_parser.add_argument("--quantization", choices=QUANTIZATIONS, default="dynamic")
+    export_parser.add_argument("--calibration-video", help="Video whose faces calibrate int8 quantization")
+    check_parser = commands.add_parser("check", help="Compare the TFLite outputs with the Keras ones")
+    check_parser.add_argument("--video", default="fake_test_video.mp4", help="Video whose faces are compared")
+    check_parser.add_argument("--feature-tolerance", type=float, default=0.98, help="Minimum mean cosine similarity")
+    check_parser.add_argument("--probability-tolerance", type=float, default=0.05, help="Maximum probability change")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "export":
+        export(args.dir, args.quantization, args.calibration_video)
+        return 0
+
+    passed, report = check_parity(args.video, args.dir, args.feature_tolerance, args.probability_tolerance)
+    print(json.dumps(report, indent=2))
+    print("Parity check passed" if passed else "Parity check FAILED")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())